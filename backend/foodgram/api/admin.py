@@ -1,7 +1,19 @@
 from django.contrib import admin
 
-from .models import (FavoriteRecipes, Follow, Ingredient, Recipe,
-                     ShopCartRecipes, Tag)
+from users.pagination import EstimatedCountPaginator
+
+from .models import (FavoriteRecipes, Follow, Ingredient, Job, Recipe,
+                     RecipeIngredient, ShopCartRecipes, Tag)
+
+
+class RecipeIngredientInline(admin.TabularInline):
+    model = RecipeIngredient
+    min_num = 1
+    extra = 0
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredient')
 
 
 class RecipeAdmin(admin.ModelAdmin):
@@ -9,34 +21,66 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'name', 'author', 'amount_of_adding_to_favorite'
     )
+    list_select_related = ('author',)
     search_fields = ('name', 'author__username', 'tags__name')
     list_filter = ('pub_date',)
+    autocomplete_fields = ('author', 'tags')
     empty_value_display = '-пусто-'
+    inlines = (RecipeIngredientInline,)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def amount_of_adding_to_favorite(self, obj):
-        return obj.fav_recipes.count()
+        return obj.favorites_count
+
+    amount_of_adding_to_favorite.admin_order_field = 'favorites_count'
 
 
 class TagAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
     list_display = ('pk', 'name', 'color')
+    search_fields = ('name', 'slug')
 
 
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'measurement_unit')
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
+    search_fields = ('name',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class ShopCartRecipesAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'user')
+    list_select_related = ('recipe', 'user')
+    autocomplete_fields = ('recipe', 'user')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class FavoriteRecipesAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'user')
+    list_select_related = ('recipe', 'user')
+    autocomplete_fields = ('recipe', 'user')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'status', 'attempts', 'user', 'run_at')
+    list_filter = ('status', 'name')
+    list_select_related = ('user',)
+    readonly_fields = ('attempts', 'locked_until', 'result', 'error')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(Recipe, RecipeAdmin)
@@ -45,3 +89,4 @@ admin.site.register(Follow, FollowAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(FavoriteRecipes, FavoriteRecipesAdmin)
 admin.site.register(ShopCartRecipes, ShopCartRecipesAdmin)
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,105 @@
+import bisect
+import threading
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CatalogVersion, Ingredient
+
+VERSION_PK = 1
+
+
+def get_catalog_state(request=None):
+    """Return the catalog version and the time of the last change.
+
+    The state is read from the database, so changes made by other
+    processes are seen at once. It is read once per request.
+    """
+    state = getattr(request, '_catalog_state', None)
+    if state is None:
+        state = CatalogVersion.objects.filter(pk=VERSION_PK).values_list(
+            'version', 'changed_at'
+        ).first()
+        if state is None:
+            version, _ = CatalogVersion.objects.get_or_create(pk=VERSION_PK)
+            state = version.version, version.changed_at
+        if request is not None:
+            request._catalog_state = state
+    return state
+
+
+def get_catalog_version(request=None):
+    return get_catalog_state(request)[0]
+
+
+def bump_catalog_version():
+    updated = CatalogVersion.objects.filter(pk=VERSION_PK).update(
+        version=F('version') + 1, changed_at=timezone.now()
+    )
+    if not updated:
+        CatalogVersion.objects.get_or_create(
+            pk=VERSION_PK, defaults={'version': 1}
+        )
+
+
+def catalog_etag(request, *args, **kwargs):
+    return str(get_catalog_version(request))
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    return get_catalog_state(request)[1]
+
+
+class IngredientIndex:
+    """In-process autocomplete index over ingredient names.
+
+    Ingredients are kept sorted by their lowercased name, so prefix matches
+    are found with a binary search and returned before substring matches.
+    The index reloads itself when the catalog version changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+
+    def _load(self, version):
+        ingredients = sorted(
+            Ingredient.objects.all(),
+            key=lambda ingredient: (ingredient.name.lower(), ingredient.pk)
+        )
+        keys = [ingredient.name.lower() for ingredient in ingredients]
+        return version, keys, ingredients
+
+    def _get_state(self):
+        version = get_catalog_version()
+        state = self._state
+        if state is None or state[0] != version:
+            with self._lock:
+                state = self._state
+                if state is None or state[0] != version:
+                    state = self._state = self._load(version)
+        return state
+
+    def invalidate(self):
+        self._state = None
+
+    def search(self, name, limit):
+        _, keys, ingredients = self._get_state()
+        query = name.strip().lower()
+        start = bisect.bisect_left(keys, query)
+        end = start
+        while end < len(keys) and end - start < limit:
+            if not keys[end].startswith(query):
+                break
+            end += 1
+        result = ingredients[start:end]
+        if len(result) < limit:
+            for position, key in enumerate(keys):
+                if query in key and not start <= position < end:
+                    result.append(ingredients[position])
+                    if len(result) == limit:
+                        break
+        return result
+
+
+ingredient_index = IngredientIndex()
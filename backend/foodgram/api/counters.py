@@ -0,0 +1,71 @@
+from collections import Counter
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import User
+
+from .models import FavoriteRecipes, Follow, Recipe, ShopCartRecipes
+
+# Owner model -> counter column -> (counted model, field pointing at the
+# owner).
+COUNTERS = {
+    Recipe: {
+        'favorites_count': (FavoriteRecipes, 'recipe'),
+        'in_carts_count': (ShopCartRecipes, 'recipe'),
+    },
+    User: {
+        'recipes_count': (Recipe, 'author'),
+        'followers_count': (Follow, 'author'),
+    },
+}
+COUNTED_MODELS = [
+    model for counters in COUNTERS.values()
+    for model, _ in counters.values()
+]
+
+
+def count_rows(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def recount(queryset):
+    """Recompute every counter column of the rows of ``queryset``."""
+    return queryset.update(**{
+        column: count_rows(model, field)
+        for column, (model, field) in COUNTERS[queryset.model].items()
+    })
+
+
+def update_counters(sender, instances, delta):
+    """Apply ``delta`` to the counters that count the given instances."""
+    for owner, counters in COUNTERS.items():
+        for column, (model, field) in counters.items():
+            if model is sender:
+                change_counter(owner, column, [
+                    getattr(instance, f'{field}_id') for instance in instances
+                ], delta)
+
+
+def change_counter(model, column, pks, delta):
+    """Add ``delta`` to ``column`` once for every occurrence of a pk.
+
+    Rows are updated with F() expressions, so concurrent changes are not
+    lost. Decrements never take a counter below zero.
+    """
+    for step, pks in group_by_step(pks, delta).items():
+        queryset = model.objects.filter(pk__in=pks)
+        if step < 0:
+            queryset = queryset.filter(**{f'{column}__gte': -step})
+        queryset.update(**{column: F(column) + step})
+
+
+def group_by_step(pks, delta):
+    groups = {}
+    for pk, times in Counter(pks).items():
+        groups.setdefault(times * delta, []).append(pk)
+    return groups
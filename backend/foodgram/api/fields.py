@@ -1,35 +1,62 @@
-import base64
-import imghdr
-import uuid
-
-from django.core.files.base import ContentFile
-from django.utils import six
+from django.conf import settings
+from django.core.files import File
 
 from rest_framework import serializers
 
+from .images import InvalidImage, decode_base64, get_image_set, prepare_image
+
+DATA_URI_SEPARATOR = ';base64,'
+
 
 class Base64ImageField(serializers.ImageField):
+    default_error_messages = {
+        'max_size': 'The image must not be larger than {max_size} bytes.',
+        'max_pixels': 'The image must not have more than {max_pixels} '
+                      'pixels.',
+    }
+
     def to_internal_value(self, data):
-        if isinstance(data, six.string_types):
-            if 'data:' in data and ';base64,' in data:
-                header, data = data.split(';base64,')
-            try:
-                decoded_file = base64.b64decode(data)
-            except TypeError:
-                self.fail('invalid_image')
-            file_name = str(uuid.uuid4())
-            file_extension = self.get_file_extension(file_name, decoded_file)
-            complete_file_name = "%s.%s" % (file_name, file_extension, )
-            print(complete_file_name)
-            data = ContentFile(decoded_file, name=complete_file_name)
-        return super(Base64ImageField, self).to_internal_value(data)
-
-    def get_file_extension(self, file_name, decoded_file):
-        extension = imghdr.what(file_name, decoded_file)
-        extension = 'jpg' if extension == 'jpeg' else extension
-        return extension
+        try:
+            if isinstance(data, str):
+                start = 0
+                if data.startswith('data:'):
+                    start = data.find(DATA_URI_SEPARATOR)
+                    if start == -1:
+                        self.fail('invalid_image')
+                    start += len(DATA_URI_SEPARATOR)
+                file = decode_base64(data, start)
+            elif hasattr(data, 'read'):
+                if data.size > settings.IMAGE_UPLOAD_MAX_SIZE:
+                    self.fail(
+                        'max_size', max_size=settings.IMAGE_UPLOAD_MAX_SIZE
+                    )
+                file = data
+            else:
+                self.fail('invalid')
+            extension = prepare_image(file)
+        except InvalidImage as error:
+            self.fail(
+                error.code, max_size=settings.IMAGE_UPLOAD_MAX_SIZE,
+                max_pixels=settings.IMAGE_MAX_PIXELS
+            )
+        # The image was verified above, so only the file checks remain.
+        # The storage names the file after its content.
+        return serializers.FileField.to_internal_value(
+            self, File(file, name=f'image.{extension}')
+        )
 
     def to_representation(self, value):
         if not value:
             return None
         return value.url
+
+
+class ImageSetField(serializers.ReadOnlyField):
+    """URLs of the renditions of an image by size and format."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'image')
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return get_image_set(value.name, value.storage)
@@ -1,3 +1,7 @@
+from django.db.models import Case, IntegerField, Value, When
+
+from rest_framework.filters import OrderingFilter
+
 from django_filters import rest_framework as filters
 
 from .models import Ingredient, Recipe, Tag
@@ -6,7 +10,7 @@ from .models import Ingredient, Recipe, Tag
 class CustomSearchFilter(filters.FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug', to_field_name='slug',
-        queryset=Tag.objects.all()
+        queryset=Tag.objects.all(), method='filter_tags'
     )
     author = filters.CharFilter(field_name='author__id')
     is_in_shopping_cart = filters.BooleanFilter(method='shop_cart')
@@ -16,6 +20,11 @@ class CustomSearchFilter(filters.FilterSet):
         model = Recipe
         fields = ['tags', 'author', 'is_in_shopping_cart', 'is_favorited']
 
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.with_any_tag(value)
+
     def shop_cart(self, queryset, name, value):
         if self.request.user.is_authenticated:
             if name and value:
@@ -34,8 +43,26 @@ class CustomSearchFilter(filters.FilterSet):
 
 
 class CustomIngredientFilter(filters.FilterSet):
-    name = filters.CharFilter(field_name='name', lookup_expr='icontains')
+    name = filters.CharFilter(method='search')
 
     class Meta:
         model = Ingredient
         fields = ['name']
+
+    def search(self, queryset, name, value):
+        return queryset.filter(name__icontains=value).annotate(
+            is_prefix=Case(
+                When(name__istartswith=value, then=Value(0)),
+                default=Value(1), output_field=IntegerField()
+            )
+        ).order_by('is_prefix', 'name')
+
+
+class StableOrderingFilter(OrderingFilter):
+    """Break ties by id, so that pages neither repeat nor skip rows."""
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering = [*ordering, '-id']
+        return ordering
@@ -0,0 +1,227 @@
+import base64
+import binascii
+import io
+import posixpath
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import default_storage
+
+from PIL import Image, ImageOps
+
+# A multiple of 4, so every chunk decodes on its own.
+BASE64_CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'\s')
+SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+PIL_FORMATS = {'png': 'PNG', 'jpg': 'JPEG', 'gif': 'GIF', 'webp': 'WEBP'}
+# Formats Pillow may report for each extension. Phone cameras often
+# write multi-picture JPEGs, which Pillow opens as MPO.
+ACCEPTED_FORMATS = {
+    'png': {'PNG'}, 'jpg': {'JPEG', 'MPO'}, 'gif': {'GIF'}, 'webp': {'WEBP'}
+}
+RENDITION_FORMATS = ('jpg', 'webp')
+
+
+class InvalidImage(ValueError):
+    code = 'invalid_image'
+
+
+class ImageTooLarge(InvalidImage):
+    code = 'max_size'
+
+
+class TooManyPixels(InvalidImage):
+    code = 'max_pixels'
+
+
+def spooled_file():
+    return tempfile.SpooledTemporaryFile(
+        max_size=settings.IMAGE_SPOOL_MAX_MEMORY
+    )
+
+
+def sniff_extension(header):
+    """Tell the image type from the first bytes of the file."""
+    for signature, extension in SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def decode_base64(data, start=0):
+    """Decode ``data[start:]`` into a spooled temporary file.
+
+    The text is decoded in chunks, so apart from the text itself at most
+    IMAGE_SPOOL_MAX_MEMORY bytes are held in memory. Input that would
+    decode to more than IMAGE_UPLOAD_MAX_SIZE bytes is rejected up front.
+    """
+    if WHITESPACE.search(data, start):
+        data, start = ''.join(data[start:].split()), 0
+    length = len(data) - start
+    if length % 4:
+        raise InvalidImage()
+    if length // 4 * 3 - data.count('=', -2) > (
+        settings.IMAGE_UPLOAD_MAX_SIZE
+    ):
+        raise ImageTooLarge()
+    file = spooled_file()
+    try:
+        for position in range(start, len(data), BASE64_CHUNK_SIZE):
+            file.write(base64.b64decode(
+                data[position:position + BASE64_CHUNK_SIZE], validate=True
+            ))
+    except binascii.Error:
+        file.close()
+        raise InvalidImage()
+    return file
+
+
+def downscale(file, extension):
+    """Re-encode the image to fit into IMAGE_MAX_DIMENSION pixels.
+
+    JPEG files are decoded at a reduced scale where possible and the EXIF
+    orientation is applied before the metadata is dropped.
+    """
+    limit = settings.IMAGE_MAX_DIMENSION
+    output = spooled_file()
+    file.seek(0)
+    with Image.open(file) as image:
+        image.draft(None, (limit, limit))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((limit, limit))
+        options = {}
+        if extension in ('jpg', 'webp'):
+            options['quality'] = settings.IMAGE_JPEG_QUALITY
+        image.save(output, PIL_FORMATS[extension], **options)
+    return output
+
+
+def prepare_image(file):
+    """Check an uploaded image and return its extension.
+
+    Images larger than IMAGE_MAX_DIMENSION are stored as they are and
+    shrunk later by the process_recipe_image job.
+    """
+    file.seek(0)
+    extension = sniff_extension(file.read(16))
+    if extension is None:
+        raise InvalidImage()
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            if image.format not in ACCEPTED_FORMATS[extension]:
+                raise InvalidImage()
+            width, height = image.size
+            if width * height > settings.IMAGE_MAX_PIXELS:
+                raise TooManyPixels()
+            image.verify()
+    except InvalidImage:
+        raise
+    except Exception:
+        # Pillow raises many exception types for malformed files.
+        raise InvalidImage()
+    file.seek(0)
+    return extension
+
+
+def shrink_stored_image(name, storage=default_storage):
+    """Store a copy of the image ``name`` that fits IMAGE_MAX_DIMENSION.
+
+    Returns the name of the copy, or None when the image is small enough.
+    """
+    limit = settings.IMAGE_MAX_DIMENSION
+    with storage.open(name) as file:
+        extension = sniff_extension(file.read(16))
+        file.seek(0)
+        with Image.open(file) as image:
+            if extension is None or max(image.size) <= limit:
+                return None
+        output = downscale(file, extension)
+    with output:
+        return storage.save(name, File(output))
+
+
+def get_rendition_name(name, size, extension):
+    """Return the storage name of a rendition of the image ``name``.
+
+    Renditions are named after their original, so they never change once
+    written and can be cached forever.
+    """
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    return f'{settings.IMAGE_RENDITIONS_DIR}/{stem}/{size}.{extension}'
+
+
+def get_last_rendition_name(name):
+    """Return the rendition written last, which exists once all do."""
+    return get_rendition_name(
+        name, list(settings.IMAGE_RENDITIONS)[-1], RENDITION_FORMATS[-1]
+    )
+
+
+def get_image_set(name, storage=default_storage):
+    """Return the rendition URLs of an image by size and format.
+
+    Until the process_recipe_image job has written the renditions, every
+    entry points at the original instead.
+    """
+    if not name:
+        return None
+    if not storage.exists(get_last_rendition_name(name)):
+        url = storage.url(name)
+        return {
+            size: {extension: url for extension in RENDITION_FORMATS}
+            for size in settings.IMAGE_RENDITIONS
+        }
+    return {
+        size: {
+            extension: storage.url(get_rendition_name(name, size, extension))
+            for extension in RENDITION_FORMATS
+        }
+        for size in settings.IMAGE_RENDITIONS
+    }
+
+
+def render(image, extension):
+    if extension == 'jpg' and image.mode != 'RGB':
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    output = io.BytesIO()
+    image.save(
+        output, PIL_FORMATS[extension], quality=settings.IMAGE_JPEG_QUALITY
+    )
+    return output.getvalue()
+
+
+def generate_renditions(name, storage=default_storage, force=False):
+    """Write every rendition of the stored image ``name``.
+
+    Returns False without doing anything when the renditions exist and
+    ``force`` is not set.
+    """
+    sizes = settings.IMAGE_RENDITIONS
+    if not force and storage.exists(get_last_rendition_name(name)):
+        return False
+    with storage.open(name) as file, Image.open(file) as original:
+        original.draft(None, (max(sizes.values()),) * 2)
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA')
+        for size, limit in sizes.items():
+            image = original.copy()
+            image.thumbnail((limit, limit))
+            for extension in RENDITION_FORMATS:
+                rendition = get_rendition_name(name, size, extension)
+                storage.delete(rendition)
+                storage.save(rendition, ContentFile(render(image, extension)))
+    return True
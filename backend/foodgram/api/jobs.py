@@ -0,0 +1,109 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+CLAIM_CANDIDATES = 10
+
+
+def task(function):
+    """Register ``function`` so that workers can run it by name."""
+    TASKS[function.__name__] = function
+    return function
+
+
+def enqueue(function, user=None, **kwargs):
+    """Store a job that runs ``function(**kwargs)`` in a worker.
+
+    The job becomes visible to workers when the current transaction
+    commits, so it never sees data the request rolled back. With
+    JOBS_EAGER the job runs in this process right after the commit.
+    """
+    job = Job.objects.create(name=function.__name__, kwargs=kwargs, user=user)
+    if settings.JOBS_EAGER:
+        transaction.on_commit(lambda: run_job(job.pk))
+    return job
+
+
+def get_due_jobs(now):
+    """Pending jobs whose time has come and jobs of workers that died."""
+    return Job.objects.filter(
+        Q(status=Job.PENDING, run_at__lte=now)
+        | Q(status=Job.RUNNING, locked_until__lt=now)
+    )
+
+
+def claim(jobs):
+    """Take the first job of ``jobs`` no other worker has taken.
+
+    Claiming is an UPDATE conditioned on the state the job was read in,
+    so two workers never run the same attempt and no row stays locked
+    while the job runs.
+    """
+    now = timezone.now()
+    for job in jobs.order_by('run_at', 'pk')[:CLAIM_CANDIDATES]:
+        claimed = Job.objects.filter(
+            pk=job.pk, status=job.status, attempts=job.attempts
+        ).update(
+            status=Job.RUNNING, attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=settings.JOBS_TIMEOUT),
+            updated_at=now,
+        )
+        if claimed:
+            job.status = Job.RUNNING
+            job.attempts += 1
+            return job
+    return None
+
+
+def finish(job, **fields):
+    """Record the outcome unless the job was taken over meanwhile."""
+    return Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING, attempts=job.attempts
+    ).update(locked_until=None, updated_at=timezone.now(), **fields)
+
+
+def execute(job):
+    """Run a claimed job and record its result, retry or failure."""
+    if job.attempts > job.max_attempts:
+        finish(job, status=Job.FAILED, error='The job timed out.')
+        return
+    try:
+        function = TASKS[job.name]
+        result = function(**job.kwargs)
+    except Exception as error:
+        logger.exception('Job %s failed', job)
+        message = f'{type(error).__name__}: {error}'
+        if job.attempts < job.max_attempts:
+            delay = settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+            finish(
+                job, status=Job.PENDING, error=message,
+                run_at=timezone.now() + timedelta(seconds=delay)
+            )
+        else:
+            finish(job, status=Job.FAILED, error=message)
+        return
+    finish(job, status=Job.DONE, result=result, error='')
+
+
+def run_next():
+    """Run one due job; return False when there is nothing to do."""
+    job = claim(get_due_jobs(timezone.now()))
+    if job is None:
+        return False
+    execute(job)
+    return True
+
+
+def run_job(job_id):
+    job = claim(get_due_jobs(timezone.now()).filter(pk=job_id))
+    if job is not None:
+        execute(job)
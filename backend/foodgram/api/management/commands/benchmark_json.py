@@ -0,0 +1,98 @@
+import io
+import timeit
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONParser, FastJSONRenderer, orjson
+from api.serializers import RecipeSerializer
+from api.views import RecipeViewSet
+from users.models import User
+from users.serializers import SubscribeSerializer
+from users.views import UserCustomViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure how long the stdlib and the orjson renderers and parsers '
+        'take for a page of the recipe feed and of subscriptions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', help='Username whose pages are rendered.'
+        )
+        parser.add_argument(
+            '--page-size', type=int, default=6,
+            help='Number of items per page.'
+        )
+        parser.add_argument(
+            '--number', type=int, default=1000,
+            help='Number of timed runs per case.'
+        )
+
+    def get_user(self, username):
+        users = User.objects.order_by('pk')
+        if username is not None:
+            users = users.filter(username=username)
+        user = users.first()
+        if user is None:
+            raise CommandError('There is no user to render pages for.')
+        return user
+
+    def get_pages(self, user, page_size):
+        request = SimpleNamespace(user=user, query_params=QueryDict())
+        recipes = RecipeViewSet(request=request).get_queryset()[:page_size]
+        view = UserCustomViewSet(request=request)
+        authors = view.prefetch_latest_recipes(list(
+            view.get_authors_queryset()[:page_size]
+        ))
+        context = {'request': request}
+        return {
+            'recipe feed': RecipeSerializer(
+                recipes, many=True, context=context
+            ).data,
+            'subscriptions': SubscribeSerializer(
+                authors, many=True, context=context
+            ).data,
+        }
+
+    def measure(self, function, number):
+        return timeit.timeit(function, number=number) / number * 10 ** 6
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING(
+                'orjson is not installed, both columns use the stdlib.'
+            ))
+        number = options['number']
+        pages = self.get_pages(
+            self.get_user(options['user']), options['page_size']
+        )
+        self.stdout.write(
+            f'{"":<28}{"stdlib, us":>12}{"orjson, us":>12}{"speedup":>9}'
+        )
+        for name, data in pages.items():
+            content = JSONRenderer().render(data)
+            cases = {
+                'render': (
+                    lambda: JSONRenderer().render(data),
+                    lambda: FastJSONRenderer().render(data),
+                ),
+                'parse': (
+                    lambda: JSONParser().parse(io.BytesIO(content)),
+                    lambda: FastJSONParser().parse(io.BytesIO(content)),
+                ),
+            }
+            for case, (slow, fast) in cases.items():
+                before = self.measure(slow, number)
+                after = self.measure(fast, number)
+                self.stdout.write(
+                    f'{name + " " + case:<28}{before:>12.1f}{after:>12.1f}'
+                    f'{before / after:>8.1f}x'
+                )
+            self.stdout.write(f'{name} page size: {len(content)} bytes')
@@ -0,0 +1,62 @@
+import json
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from api.recipe_json import build_documents
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeSerializer
+from api.views import RecipeViewSet
+
+
+def load(content):
+    # Pairs keep the key order, which has to match as well.
+    return json.loads(content, object_pairs_hook=list)
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that the database-built recipe JSON matches the output of '
+        'RecipeSerializer for anonymous users, key order included.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of recipes compared at a time.'
+        )
+
+    def handle(self, *args, **options):
+        request = SimpleNamespace(
+            user=AnonymousUser(), query_params=QueryDict()
+        )
+        recipes = RecipeViewSet(request=request).get_queryset().order_by('pk')
+        recipe_ids = list(recipes.values_list('pk', flat=True))
+        batch_size = options['batch_size']
+        renderer = FastJSONRenderer()
+        mismatches = []
+        for start in range(0, len(recipe_ids), batch_size):
+            batch = recipes.filter(
+                pk__in=recipe_ids[start:start + batch_size]
+            )
+            expected = RecipeSerializer(
+                batch, many=True, context={'request': request}
+            ).data
+            documents = build_documents(recipe['id'] for recipe in expected)
+            for recipe, document in zip(expected, documents):
+                if load(renderer.render(recipe)) != load(document):
+                    mismatches.append(recipe['id'])
+                    self.stderr.write(
+                        f'Recipe {recipe["id"]}:\n'
+                        f'  serializer: {renderer.render(recipe).decode()}\n'
+                        f'  database:   {document.decode()}'
+                    )
+        if mismatches:
+            raise CommandError(
+                f'{len(mismatches)} of {len(recipe_ids)} recipes differ.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'All {len(recipe_ids)} recipes match.'
+        ))
@@ -0,0 +1,134 @@
+import re
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import EmptyResultSet
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import QueryDict
+
+from api.filters import CustomIngredientFilter
+from api.models import Ingredient, Recipe, Tag
+from api.shopping_list import get_shopping_list
+from api.views import RecipeViewSet
+from users.models import User
+from users.views import UserCustomViewSet
+
+SEQUENTIAL_SCAN = re.compile(
+    r'Seq Scan on (?P<pg_table>\S+)|\bSCAN (?P<sqlite_table>\S+)$'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Print the EXPLAIN plans of the queries behind the busiest API '
+        'endpoints and flag sequential scans.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', help='Username to build per-user queries for.'
+        )
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Run EXPLAIN ANALYZE (PostgreSQL only).'
+        )
+        parser.add_argument(
+            '--page-size', type=int, default=6,
+            help='Number of rows fetched by list endpoints.'
+        )
+
+    def get_user(self, username):
+        if username is None:
+            user = User.objects.order_by('pk').first()
+            if user is None:
+                raise CommandError('There are no users to explain for.')
+            return user
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'User "{username}" does not exist.')
+
+    def get_hot_paths(self, user, page_size):
+        request = SimpleNamespace(user=user, query_params=QueryDict())
+        anonymous = SimpleNamespace(
+            user=AnonymousUser(), query_params=QueryDict()
+        )
+        recipes = RecipeViewSet(request=request).get_queryset()
+        authors = UserCustomViewSet(request=request).get_authors_queryset()
+        author_ids = authors.filter(
+            following__user=user
+        ).values_list('pk', flat=True)[:page_size]
+        return {
+            'GET /api/recipes/': RecipeViewSet(
+                request=anonymous
+            ).get_queryset()[:page_size],
+            'GET /api/recipes/?tags=': recipes.with_any_tag(
+                Tag.objects.all()[:2]
+            )[:page_size],
+            'GET /api/recipes/?author=': recipes.filter(
+                author=user
+            )[:page_size],
+            'GET /api/recipes/?is_favorited=1': recipes.filter(
+                fav_recipes__user=user
+            )[:page_size],
+            'GET /api/recipes/?is_in_shopping_cart=1': recipes.filter(
+                shop_cart__user=user
+            )[:page_size],
+            'GET /api/recipes/download_shopping_cart/': get_shopping_list(
+                user
+            ),
+            'GET /api/users/': UserCustomViewSet(
+                request=request
+            ).get_queryset()[:page_size],
+            'GET /api/users/subscriptions/': authors.filter(
+                following__user=user
+            )[:page_size],
+            'GET /api/users/subscriptions/ (recipes)':
+                Recipe.objects.top_per_author(author_ids, 3),
+            'GET /api/ingredients/?name=': CustomIngredientFilter(
+                {'name': 'a'}, queryset=Ingredient.objects.all()
+            ).qs,
+        }
+
+    def has_sequential_scan(self, plan, tables):
+        for line in plan.splitlines():
+            match = SEQUENTIAL_SCAN.search(line.strip())
+            if not match:
+                continue
+            if (match['pg_table'] or match['sqlite_table']) in tables:
+                return True
+        return False
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        explain_options = {}
+        if options['analyze']:
+            if connection.vendor != 'postgresql':
+                raise CommandError('--analyze needs PostgreSQL.')
+            explain_options['analyze'] = True
+        scans = []
+        tables = set(connection.introspection.table_names())
+        paths = self.get_hot_paths(user, options['page_size'])
+        for name, queryset in paths.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            try:
+                if queryset.query.is_empty():
+                    raise EmptyResultSet
+                plan = queryset.explain(**explain_options)
+            except EmptyResultSet:
+                # Django answers such querysets without a query, e.g. the
+                # recipes of subscriptions for a user who follows nobody.
+                self.stdout.write('No query: the result is known to be empty.')
+                self.stdout.write('')
+                continue
+            self.stdout.write(plan)
+            self.stdout.write('')
+            if self.has_sequential_scan(plan, tables):
+                scans.append(name)
+        if scans:
+            self.stdout.write(self.style.WARNING(
+                'Sequential scans in: ' + ', '.join(scans)
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('No sequential scans.'))
@@ -0,0 +1,101 @@
+import os
+import posixpath
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.models import Recipe
+
+IMAGES_DIR = Recipe._meta.get_field('image').upload_to.rstrip('/')
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete recipe images and renditions that no recipe references, '
+        'and shopping list exports. Files younger than --min-age are kept, '
+        'so uploads whose recipe is not committed yet survive.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=24 * 60,
+            help='Minimum age in minutes of the files to delete.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only list the files that would be deleted.'
+        )
+
+    def list_files(self, storage, directory):
+        directories, files = storage.listdir(directory)
+        for name in files:
+            yield posixpath.join(directory, name)
+        for name in directories:
+            yield from self.list_files(
+                storage, posixpath.join(directory, name)
+            )
+
+    def get_orphans(self, storage):
+        names = set(Recipe.objects.exclude(image='').values_list(
+            'image', flat=True
+        ))
+        stems = {
+            posixpath.splitext(posixpath.basename(name))[0]
+            for name in names
+        }
+        for directory in (
+            IMAGES_DIR, settings.IMAGE_RENDITIONS_DIR,
+            settings.SHOPPING_LIST_EXPORTS_DIR
+        ):
+            if not storage.exists(directory):
+                continue
+            for name in self.list_files(storage, directory):
+                if directory == IMAGES_DIR:
+                    referenced = name in names
+                elif directory == settings.IMAGE_RENDITIONS_DIR:
+                    stem = posixpath.relpath(name, directory).split('/')[0]
+                    referenced = stem in stems
+                else:
+                    referenced = False
+                if not referenced:
+                    yield name
+
+    def remove_empty_directories(self, storage):
+        for directory in (
+            settings.IMAGE_RENDITIONS_DIR, settings.SHOPPING_LIST_EXPORTS_DIR
+        ):
+            if not storage.exists(directory):
+                continue
+            for name in storage.listdir(directory)[0]:
+                name = posixpath.join(directory, name)
+                if any(storage.listdir(name)):
+                    continue
+                try:
+                    os.rmdir(storage.path(name))
+                except (NotImplementedError, OSError):
+                    # Storages without directories have nothing to remove.
+                    pass
+
+    def handle(self, *args, **options):
+        if options['min_age'] < 0:
+            raise CommandError('--min-age must not be negative.')
+        storage = Recipe._meta.get_field('image').storage
+        deadline = timezone.now() - timedelta(minutes=options['min_age'])
+        deleted = size = 0
+        for name in self.get_orphans(storage):
+            if storage.get_modified_time(name) > deadline:
+                continue
+            deleted += 1
+            size += storage.size(name)
+            if options['dry_run']:
+                self.stdout.write(name)
+            else:
+                storage.delete(name)
+        if not options['dry_run']:
+            self.remove_empty_directories(storage)
+        action = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {deleted} files, {size} bytes.'
+        ))
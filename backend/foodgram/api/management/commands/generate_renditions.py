@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from api.images import generate_renditions
+from api.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Generate the missing image renditions of every recipe.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Regenerate renditions that already exist.'
+        )
+
+    def handle(self, *args, **options):
+        storage = Recipe._meta.get_field('image').storage
+        names = Recipe.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).order_by('pk')
+        generated = 0
+        for name in names.iterator():
+            if not storage.exists(name):
+                self.stderr.write(f'Missing image: {name}')
+            elif generate_renditions(name, storage, options['force']):
+                generated += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated renditions for {generated} images.'
+        ))
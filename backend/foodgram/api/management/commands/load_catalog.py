@@ -0,0 +1,227 @@
+import csv
+import json
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.catalog import bump_catalog_version
+from api.models import Ingredient, Tag
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+FORMATS = ('json', 'jsonl', 'csv')
+FIXTURE_MODELS = {'api.ingredient': 'ingredient', 'api.tag': 'tag'}
+
+
+class JsonArrayReader:
+    """Iterate over the items of a top-level JSON array read in chunks.
+
+    Only the item being decoded is held in memory, so fixtures such as
+    dump.json are never parsed as a whole.
+    """
+
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+
+    def read_more(self):
+        chunk = self.file.read(self.chunk_size)
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return bool(chunk)
+
+    def peek(self):
+        while True:
+            while (self.position < len(self.buffer)
+                   and self.buffer[self.position] in WHITESPACE):
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.read_more():
+                return ''
+
+    def decode(self):
+        while True:
+            try:
+                item, end = self.decoder.raw_decode(
+                    self.buffer, self.position
+                )
+            except json.JSONDecodeError:
+                item, end = None, None
+            # A value ending the buffer may continue in the next chunk.
+            if end is not None and end < len(self.buffer):
+                break
+            if not self.read_more():
+                if end is None:
+                    raise CommandError('The JSON array is truncated.')
+                break
+        self.position = end
+        return item
+
+    def __iter__(self):
+        if self.peek() != '[':
+            raise CommandError('Expected a JSON array.')
+        self.position += 1
+        if self.peek() == ']':
+            return
+        while True:
+            self.peek()
+            yield self.decode()
+            char = self.peek()
+            if char == ']':
+                return
+            if char != ',':
+                raise CommandError('Expected "," or "]" in the JSON array.')
+            self.position += 1
+
+
+def iter_jsonl(file):
+    for number, line in enumerate(file, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as error:
+                raise CommandError(f'Line {number}: {error}')
+
+
+def iter_csv(file):
+    """Yield CSV rows as dicts.
+
+    A first row without a "name" column is treated as data in the
+    name,measurement_unit layout of the original ingredients.csv.
+    """
+    reader = csv.reader(file)
+    header = next(reader, None)
+    if header is None:
+        return
+    if 'name' in header:
+        columns = header
+    else:
+        columns = ['name', 'measurement_unit']
+        yield dict(zip(columns, header))
+    for row in reader:
+        if row:
+            yield dict(zip(columns, row))
+
+
+READERS = {'json': JsonArrayReader, 'jsonl': iter_jsonl, 'csv': iter_csv}
+
+
+def parse_record(record):
+    """Return the kind and fields of a record, or None to skip it.
+
+    Both plain objects and Django fixture entries are accepted.
+    """
+    if not isinstance(record, dict):
+        return None
+    if 'model' in record and 'fields' in record:
+        kind = FIXTURE_MODELS.get(record['model'])
+        record = record['fields']
+    elif 'measurement_unit' in record:
+        kind = 'ingredient'
+    elif 'slug' in record or 'color' in record:
+        kind = 'tag'
+    else:
+        kind = None
+    if kind is None or not str(record.get('name') or '').strip():
+        return None
+    return kind, record
+
+
+class Command(BaseCommand):
+    help = (
+        'Load ingredients and tags from JSON, JSON Lines or CSV files. '
+        'Ingredients are inserted in batches and existing '
+        '(name, measurement_unit) pairs are skipped; tags are matched by '
+        'slug and updated.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Files to load.')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='File format; guessed from the extension by default.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of ingredients inserted per statement.'
+        )
+
+    def get_format(self, path, file_format):
+        file_format = file_format or os.path.splitext(path)[1][1:].lower()
+        if file_format not in FORMATS:
+            raise CommandError(
+                f'Cannot tell the format of "{path}", use --format.'
+            )
+        return file_format
+
+    def flush(self, batch):
+        Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+        batch.clear()
+
+    def load_tag(self, fields):
+        name = fields['name'].strip()
+        defaults = {'name': name}
+        if fields.get('color'):
+            defaults['color'] = fields['color']
+        lookup = {'slug': fields['slug']} if fields.get('slug') else {
+            'name': name
+        }
+        try:
+            Tag.objects.update_or_create(**lookup, defaults=defaults)
+        except ValidationError as error:
+            raise CommandError(error.messages[0])
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive.')
+        ingredients_before = Ingredient.objects.count()
+        seen = set()
+        batch = []
+        read = duplicates = tags = 0
+        for path in options['paths']:
+            reader = READERS[self.get_format(path, options['format'])]
+            try:
+                file = open(path, encoding='utf-8', newline='')
+            except OSError as error:
+                raise CommandError(error)
+            with file:
+                for record in reader(file):
+                    parsed = parse_record(record)
+                    if parsed is None:
+                        continue
+                    kind, fields = parsed
+                    read += 1
+                    if kind == 'tag':
+                        self.load_tag(fields)
+                        tags += 1
+                        continue
+                    key = (
+                        fields['name'].strip(),
+                        str(fields.get('measurement_unit') or '').strip()
+                    )
+                    if key in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(key)
+                    batch.append(
+                        Ingredient(name=key[0], measurement_unit=key[1])
+                    )
+                    if len(batch) == batch_size:
+                        self.flush(batch)
+                        self.stdout.write(f'{read} records processed')
+        self.flush(batch)
+        inserted = Ingredient.objects.count() - ingredients_before
+        transaction.on_commit(bump_catalog_version)
+        self.stdout.write(self.style.SUCCESS(
+            f'{read} records processed: {inserted} ingredients added, '
+            f'{len(seen) - inserted} already present, {duplicates} '
+            f'duplicates skipped, {tags} tags loaded.'
+        ))
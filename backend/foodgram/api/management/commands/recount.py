@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.counters import recount
+from api.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the denormalized favourites, carts, recipes and '
+        'followers counters from the related rows.'
+    )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        recipes = recount(Recipe.objects.all())
+        users = recount(User.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f'Recounted {recipes} recipes and {users} users.'
+        ))
@@ -0,0 +1,87 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+
+from api.jobs import run_next
+
+
+class Worker:
+    """Run due jobs one at a time until stopped.
+
+    SIGTERM and SIGINT let the current job finish before the worker
+    exits, so deploys do not leave jobs to the timeout.
+    """
+
+    def __init__(self, burst, poll_interval):
+        self.burst = burst
+        self.poll_interval = poll_interval
+        self.stopped = False
+
+    def stop(self, signum, frame):
+        self.stopped = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        while not self.stopped:
+            close_old_connections()
+            if run_next():
+                continue
+            if self.burst:
+                break
+            time.sleep(self.poll_interval)
+
+
+class Command(BaseCommand):
+    help = (
+        'Run background jobs stored in the database, such as image '
+        'processing and shopping list exports.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Number of worker processes.'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no job is due instead of waiting for more.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=settings.JOBS_POLL_INTERVAL,
+            help='Seconds to wait between polls of an empty queue.'
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers < 1:
+            raise CommandError('--workers must be positive.')
+        worker = Worker(options['burst'], options['poll_interval'])
+        if workers == 1:
+            worker.run()
+            return
+        # Forked processes must not share the database connection.
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=worker.run)
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f'Started {workers} workers.')
+
+        def stop(signum, frame):
+            # Each worker finishes its current job on SIGTERM.
+            for process in processes:
+                process.terminate()
+
+        # Ctrl+C reaches the workers through the process group.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, stop)
+        for process in processes:
+            process.join()
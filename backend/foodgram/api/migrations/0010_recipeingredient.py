@@ -0,0 +1,89 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:02
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def copy_amounts_to_recipes(apps, schema_editor):
+    Recipe = apps.get_model('api', 'Recipe')
+    RecipeIngredient = apps.get_model('api', 'RecipeIngredient')
+    rows = Recipe.ingredients.through.objects.values_list(
+        'recipe_id', 'ingredient_id', 'ingredient__amount'
+    ).order_by('pk')
+    batch = []
+    for recipe_id, ingredient_id, amount in rows.iterator():
+        batch.append(RecipeIngredient(
+            recipe_id=recipe_id, ingredient_id=ingredient_id,
+            amount=max(amount, 1)
+        ))
+        if len(batch) >= BATCH_SIZE:
+            RecipeIngredient.objects.bulk_create(batch)
+            batch = []
+    RecipeIngredient.objects.bulk_create(batch)
+
+
+def copy_amounts_to_ingredients(apps, schema_editor):
+    Recipe = apps.get_model('api', 'Recipe')
+    Ingredient = apps.get_model('api', 'Ingredient')
+    RecipeIngredient = apps.get_model('api', 'RecipeIngredient')
+    through = Recipe.ingredients.through
+    amounts = {}
+    batch = []
+    rows = RecipeIngredient.objects.values_list(
+        'recipe_id', 'ingredient_id', 'amount'
+    ).order_by('pk')
+    for recipe_id, ingredient_id, amount in rows.iterator():
+        amounts[ingredient_id] = amount
+        batch.append(through(recipe_id=recipe_id, ingredient_id=ingredient_id))
+        if len(batch) >= BATCH_SIZE:
+            through.objects.bulk_create(batch)
+            batch = []
+    through.objects.bulk_create(batch)
+    for ingredient_id, amount in amounts.items():
+        Ingredient.objects.filter(pk=ingredient_id).update(amount=amount)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_auto_20220815_0933'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeIngredient',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='Quantity')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_ingredients', to='api.ingredient', verbose_name='Ingredient')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_ingredients', to='api.recipe', verbose_name='Recipe')),
+            ],
+            options={
+                'verbose_name': 'Recipe ingredient',
+                'verbose_name_plural': 'Recipe ingredients',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='recipe-ingredient'),
+        ),
+        migrations.RunPython(
+            copy_amounts_to_recipes, copy_amounts_to_ingredients
+        ),
+        migrations.RemoveField(
+            model_name='recipe',
+            name='ingredients',
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredients',
+            field=models.ManyToManyField(related_name='recipes', through='api.RecipeIngredient', to='api.Ingredient', verbose_name='Ingredients'),
+        ),
+        migrations.RemoveField(
+            model_name='ingredient',
+            name='amount',
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.1.14 on 2026-10-18 20:10
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('api', 'Ingredient')
+    RecipeIngredient = apps.get_model('api', 'RecipeIngredient')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(kept=Min('pk'), total=Count('pk')).filter(total__gt=1)
+    for duplicate in duplicates:
+        kept = duplicate.pop('kept')
+        duplicate.pop('total')
+        others = Ingredient.objects.filter(**duplicate).exclude(pk=kept)
+        for row in RecipeIngredient.objects.filter(ingredient__in=others):
+            existing = RecipeIngredient.objects.filter(
+                recipe_id=row.recipe_id, ingredient_id=kept
+            ).first()
+            if existing is None:
+                row.ingredient_id = kept
+                row.save(update_fields=['ingredient'])
+            else:
+                existing.amount += row.amount
+                existing.save(update_fields=['amount'])
+                row.delete()
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='ingredient-name-unit'),
+        ),
+    ]
@@ -6,3 +6,7 @@ class ListRetrieveViewSet(
     ListModelMixin, viewsets.GenericViewSet, RetrieveModelMixin
 ):
     pass
+
+
+class RetrieveViewSet(RetrieveModelMixin, viewsets.GenericViewSet):
+    pass
@@ -1,9 +1,15 @@
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connection, models
+from django.db.models import Exists, F, OuterRef, Prefetch, Value
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
 
 from colorfield.fields import ColorField
 
-from users.models import User
+from users.models import CounterFieldsMixin, User
 
 
 class Tag(models.Model):
@@ -17,6 +23,11 @@ class Tag(models.Model):
     slug = models.SlugField(
         max_length=200, unique=True, null=True, verbose_name='Slug'
     )
+    bit = models.PositiveSmallIntegerField(
+        unique=True, null=True, editable=False, verbose_name='Mask bit'
+    )
+
+    MAX_TAGS = 63
 
     class Meta:
         ordering = ('name',)
@@ -26,6 +37,29 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def mask(self):
+        return 1 << self.bit
+
+    @classmethod
+    def get_free_bit(cls):
+        used = set(cls.objects.exclude(bit=None).values_list('bit', flat=True))
+        for bit in range(cls.MAX_TAGS):
+            if bit not in used:
+                return bit
+        raise ValidationError(
+            f'There can not be more than {cls.MAX_TAGS} tags'
+        )
+
+    def clean(self):
+        if self.bit is None:
+            self.get_free_bit()
+
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            self.bit = self.get_free_bit()
+        super().save(*args, **kwargs)
+
 
 class Ingredient(models.Model):
     name = models.CharField(
@@ -34,13 +68,12 @@ class Ingredient(models.Model):
     measurement_unit = models.CharField(
         max_length=200, verbose_name='Measurement unit'
     )
-    amount = models.IntegerField(
-        verbose_name='Quantity',
-        default=1,
-    )
 
     class Meta:
         ordering = ('name',)
+        constraints = [models.UniqueConstraint(
+            fields=['name', 'measurement_unit'], name='ingredient-name-unit'
+        )]
         verbose_name = 'Ingredient'
         verbose_name_plural = 'Ingredients'
 
@@ -48,7 +81,87 @@ class Ingredient(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ).order_by('pk')
+            ),
+        )
+
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False, output_field=models.BooleanField()),
+                is_in_shopping_cart=Value(
+                    False, output_field=models.BooleanField()
+                ),
+                author_is_subscribed=Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=Exists(FavoriteRecipes.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShopCartRecipes.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            author_is_subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef('author')
+            )),
+        )
+
+    def top_per_author(self, author_ids, limit):
+        """Restrict to the latest ``limit`` recipes of every given author.
+
+        The recipes are ranked with ROW_NUMBER() OVER (PARTITION BY author)
+        in a single subquery.
+        """
+        author_ids = list(author_ids)
+        if not author_ids:
+            return self.none()
+        quote = connection.ops.quote_name
+        sql = (
+            f'SELECT {quote("id")} FROM ('
+            f'SELECT {quote("id")}, ROW_NUMBER() OVER ('
+            f'PARTITION BY {quote("author_id")} '
+            f'ORDER BY {quote("pub_date")} DESC, {quote("id")} DESC'
+            f') AS {quote("position")} '
+            f'FROM {quote(self.model._meta.db_table)} '
+            f'WHERE {quote("author_id")} IN '
+            f'({", ".join(["%s"] * len(author_ids))})'
+            f') AS {quote("ranked")} WHERE {quote("position")} <= %s'
+        )
+        return self.filter(pk__in=RawSQL(sql, [*author_ids, limit]))
+
+    def with_any_tag(self, tags):
+        mask = 0
+        for tag in tags:
+            mask |= tag.mask
+        return self.annotate(
+            matched_tags=F('tags_mask').bitand(mask)
+        ).filter(matched_tags__gt=0)
+
+    def update_tags_mask(self):
+        masks = defaultdict(int)
+        rows = Recipe.tags.through.objects.filter(
+            recipe__in=self.values('pk')
+        ).values_list('recipe_id', 'tag__bit')
+        for recipe_id, bit in rows:
+            masks[recipe_id] |= 1 << bit
+        recipes = list(self.only('pk'))
+        for recipe in recipes:
+            recipe.tags_mask = masks[recipe.pk]
+        Recipe.objects.bulk_update(recipes, ['tags_mask'])
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='recipes',
         verbose_name='Author'
@@ -61,7 +174,9 @@ class Recipe(models.Model):
     )
     text = models.TextField(verbose_name='Recipe description')
     ingredients = models.ManyToManyField(
-        'Ingredient', verbose_name='Ingredients', related_name='recipes')
+        'Ingredient', through='RecipeIngredient',
+        verbose_name='Ingredients', related_name='recipes'
+    )
     tags = models.ManyToManyField(
         'Tag', verbose_name='Tags', related_name='recipes'
     )
@@ -71,9 +186,35 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         verbose_name='Publication date', auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Update date', auto_now=True
+    )
+    tags_mask = models.BigIntegerField(
+        default=0, editable=False, verbose_name='Tags mask'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Favourites count'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Carts count'
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    counter_fields = ('favorites_count', 'in_carts_count')
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], name='recipe_feed_idx'),
+            models.Index(
+                fields=['author', '-pub_date'], name='recipe_author_feed_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_popularity_idx'
+            ),
+        ]
         verbose_name = 'Recipe'
         verbose_name_plural = 'Recipes'
 
@@ -81,6 +222,31 @@ class Recipe(models.Model):
         return self.name
 
 
+class RecipeIngredient(models.Model):
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name='recipe_ingredients',
+        verbose_name='Recipe'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE,
+        related_name='recipe_ingredients', verbose_name='Ingredient'
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Quantity', validators=[MinValueValidator(1)]
+    )
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['recipe', 'ingredient'], name="recipe-ingredient"
+            )
+        ]
+        verbose_name = 'Recipe ingredient'
+        verbose_name_plural = 'Recipe ingredients'
+
+    def __str__(self):
+        return f'Recipe {self.recipe}, Ingredient: {self.ingredient}'
+
+
 class Follow(models.Model):
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='follower',
@@ -118,6 +284,11 @@ class FavoriteRecipes(models.Model):
             fields=['recipe', 'user'], name="fav_recipe-user"
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['user', 'recipe'], name='fav_user_recipe_idx'
+            ),
+        ]
         verbose_name = 'Favourite recipe'
         verbose_name_plural = 'Favourite recipes'
 
@@ -140,8 +311,88 @@ class ShopCartRecipes(models.Model):
             fields=['recipe', 'user'], name="cart_recipe-user"
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['user', 'recipe'], name='cart_user_recipe_idx'
+            ),
+        ]
         verbose_name = 'Cart'
         verbose_name_plural = 'Carts'
 
     def __str__(self):
         return f'Recipe {self.recipe}, Follower: {self.user}'
+
+
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=100, verbose_name='Task')
+    kwargs = models.JSONField(default=dict, verbose_name='Arguments')
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='jobs', verbose_name='User'
+    )
+    status = models.CharField(
+        max_length=10, choices=STATUSES, default=PENDING,
+        verbose_name='Status'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name='Attempts'
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=3, verbose_name='Maximum attempts'
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now, verbose_name='Run at'
+    )
+    locked_until = models.DateTimeField(
+        null=True, blank=True, verbose_name='Locked until'
+    )
+    result = models.JSONField(null=True, blank=True, verbose_name='Result')
+    error = models.TextField(blank=True, verbose_name='Error')
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name='Creation date'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name='Update date'
+    )
+
+    class Meta:
+        ordering = ('-created_at',)
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_queue_idx'),
+        ]
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}: {self.status}'
+
+
+class CatalogVersion(models.Model):
+    """Single row counting changes to tags and ingredients.
+
+    It lives in the database so that every process sees the same value.
+    """
+    version = models.PositiveBigIntegerField(
+        default=0, verbose_name='Version'
+    )
+    changed_at = models.DateTimeField(
+        default=timezone.now, verbose_name='Change date'
+    )
+
+    class Meta:
+        verbose_name = 'Catalog version'
+        verbose_name_plural = 'Catalog versions'
+
+    def __str__(self):
+        return f'Catalog version {self.version}'
@@ -0,0 +1,115 @@
+import zlib
+
+from django.conf import settings
+
+from PIL import Image, ImageDraw, ImageFont
+
+PAGE_SIZE = (595, 842)
+DPI = 100
+MARGIN = 60
+LINE_HEIGHT = 22
+FONT_SIZE = 16
+
+
+def get_font():
+    try:
+        return ImageFont.truetype(settings.PDF_FONT_PATH, FONT_SIZE)
+    except (AttributeError, OSError):
+        return ImageFont.load_default()
+
+
+def render_page(lines, font):
+    width = PAGE_SIZE[0] * DPI // 72
+    height = PAGE_SIZE[1] * DPI // 72
+    page = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    for number, line in enumerate(lines):
+        draw.text(
+            (MARGIN, MARGIN + number * LINE_HEIGHT), line, fill=0, font=font
+        )
+    return page
+
+
+def paginate(lines):
+    height = PAGE_SIZE[1] * DPI // 72
+    per_page = (height - 2 * MARGIN) // LINE_HEIGHT
+    page = []
+    for line in lines:
+        page.append(line)
+        if len(page) == per_page:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def render_pdf(lines):
+    """Stream a PDF document with one line of text per row.
+
+    Pages are rasterised one at a time with Pillow, so the text can use any
+    glyphs of the configured TrueType font and only a single page is held in
+    memory. The page tree and cross-reference table are written last.
+    """
+    offsets = {}
+    position = 0
+    page_ids = []
+    next_id = 3
+
+    def write(obj_id, body):
+        nonlocal position
+        offsets[obj_id] = position
+        chunk = b'%d 0 obj\n' % obj_id + body + b'\nendobj\n'
+        position += len(chunk)
+        return chunk
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position += len(header)
+    yield header
+
+    font = get_font()
+    for page_lines in paginate(lines):
+        image = render_page(page_lines, font)
+        data = zlib.compress(image.tobytes())
+        image_id, content_id, page_id = next_id, next_id + 1, next_id + 2
+        next_id += 3
+        yield write(image_id, (
+            b'<< /Type /XObject /Subtype /Image /Width %d /Height %d '
+            b'/ColorSpace /DeviceGray /BitsPerComponent 8 '
+            b'/Filter /FlateDecode /Length %d >>\nstream\n'
+            % (image.width, image.height, len(data))
+        ) + data + b'\nendstream')
+        content = b'q %d 0 0 %d 0 0 cm /Im0 Do Q' % PAGE_SIZE
+        yield write(content_id, (
+            b'<< /Length %d >>\nstream\n' % len(content)
+        ) + content + b'\nendstream')
+        yield write(page_id, (
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /XObject << /Im0 %d 0 R >> >> '
+            b'/Contents %d 0 R >>' % (PAGE_SIZE + (image_id, content_id))
+        ))
+        page_ids.append(page_id)
+
+    if not page_ids:
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        yield write(content_id, b'<< /Length 0 >>\nstream\n\nendstream')
+        yield write(page_id, (
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Contents %d 0 R >>' % (PAGE_SIZE + (content_id,))
+        ))
+        page_ids.append(page_id)
+
+    kids = b' '.join(b'%d 0 R' % page_id for page_id in page_ids)
+    yield write(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        kids, len(page_ids)
+    ))
+    yield write(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+
+    xref = [b'xref\n0 %d\n' % next_id, b'0000000000 65535 f \n']
+    xref.extend(
+        b'%010d 00000 n \n' % offsets[obj_id] for obj_id in range(1, next_id)
+    )
+    yield b''.join(xref) + (
+        b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+        % (next_id, position)
+    )
@@ -0,0 +1,169 @@
+from collections import defaultdict
+
+from django.db import connections
+
+from users.models import User
+
+from .images import get_image_set
+from .models import Ingredient, Recipe, RecipeIngredient, Tag
+from .renderers import FastJSONRenderer
+
+
+def render_image(name):
+    """Render the image and image_set members of a recipe document."""
+    storage = Recipe._meta.get_field('image').storage
+    return FastJSONRenderer().render({
+        'image': storage.url(name) if name else None,
+        'image_set': get_image_set(name, storage),
+    })
+
+
+def join_document(head, image, tail):
+    """Join the JSON objects around the image into one recipe document.
+
+    The image URLs come from the storage of Recipe.image, so they are the
+    only values built in Python.
+    """
+    return b''.join((head[:-1], b',', image[1:-1], b',', tail[1:]))
+
+
+def get_postgresql_sql(connection):
+    quote = connection.ops.quote_name
+    recipe = quote(Recipe._meta.db_table)
+    tags = quote(Recipe.tags.through._meta.db_table)
+    tag = quote(Tag._meta.db_table)
+    user = quote(User._meta.db_table)
+    ingredients = quote(RecipeIngredient._meta.db_table)
+    ingredient = quote(Ingredient._meta.db_table)
+    head = (
+        f"json_build_object("
+        f"'id', {recipe}.id, "
+        f"'tags', COALESCE((SELECT json_agg(json_build_object("
+        f"'id', t.id, 'name', t.name, 'color', t.color, 'slug', t.slug"
+        f") ORDER BY t.name) FROM {tag} t JOIN {tags} rt "
+        f"ON rt.tag_id = t.id WHERE rt.recipe_id = {recipe}.id), '[]'), "
+        f"'author', (SELECT json_build_object("
+        f"'email', u.email, 'id', u.id, 'username', u.username, "
+        f"'first_name', u.first_name, 'last_name', u.last_name, "
+        f"'is_subscribed', FALSE"
+        f") FROM {user} u WHERE u.id = {recipe}.author_id), "
+        f"'ingredients', COALESCE((SELECT json_agg(json_build_object("
+        f"'id', ri.ingredient_id, 'name', i.name, "
+        f"'measurement_unit', i.measurement_unit, 'amount', ri.amount"
+        f") ORDER BY ri.id) FROM {ingredients} ri JOIN {ingredient} i "
+        f"ON i.id = ri.ingredient_id WHERE ri.recipe_id = {recipe}.id), "
+        f"'[]'), "
+        f"'is_favorited', FALSE, 'is_in_shopping_cart', FALSE, "
+        f"'name', {recipe}.name"
+        f")::text"
+    )
+    tail = (
+        f"json_build_object("
+        f"'text', {recipe}.text, 'cooking_time', {recipe}.cooking_time"
+        f")::text"
+    )
+    return (
+        f'SELECT {recipe}.id, {head}, {recipe}.image, {tail} '
+        f'FROM {recipe} WHERE {recipe}.id IN ({{}})'
+    )
+
+
+def build_in_postgresql(recipe_ids, connection):
+    """Build the documents with json_build_object and json_agg."""
+    sql = get_postgresql_sql(connection).format(
+        ', '.join(['%s'] * len(recipe_ids))
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, recipe_ids)
+        return {
+            recipe_id: join_document(
+                head.encode(), render_image(image), tail.encode()
+            )
+            for recipe_id, head, image, tail in cursor.fetchall()
+        }
+
+
+def build_from_values(recipe_ids):
+    """Build the documents from flat values() rows of three queries."""
+    tags = defaultdict(list)
+    for recipe_id, *tag in Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('tag__name').values_list(
+        'recipe_id', 'tag__id', 'tag__name', 'tag__color', 'tag__slug'
+    ):
+        tags[recipe_id].append(dict(zip(('id', 'name', 'color', 'slug'), tag)))
+    ingredients = defaultdict(list)
+    for recipe_id, *ingredient in RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('pk').values_list(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount'
+    ):
+        ingredients[recipe_id].append(dict(zip(
+            ('id', 'name', 'measurement_unit', 'amount'), ingredient
+        )))
+    renderer = FastJSONRenderer()
+    documents = {}
+    for row in Recipe.objects.filter(pk__in=recipe_ids).values(
+        'id', 'name', 'image', 'text', 'cooking_time', 'author__email',
+        'author__id', 'author__username', 'author__first_name',
+        'author__last_name',
+    ):
+        head = renderer.render({
+            'id': row['id'],
+            'tags': tags[row['id']],
+            'author': {
+                'email': row['author__email'],
+                'id': row['author__id'],
+                'username': row['author__username'],
+                'first_name': row['author__first_name'],
+                'last_name': row['author__last_name'],
+                'is_subscribed': False,
+            },
+            'ingredients': ingredients[row['id']],
+            'is_favorited': False,
+            'is_in_shopping_cart': False,
+            'name': row['name'],
+        })
+        tail = renderer.render({
+            'text': row['text'], 'cooking_time': row['cooking_time']
+        })
+        documents[row['id']] = join_document(
+            head, render_image(row['image']), tail
+        )
+    return documents
+
+
+def build_documents(recipe_ids):
+    """Return the anonymous RecipeSerializer JSON of the given recipes.
+
+    The documents are built on PostgreSQL with json_build_object, or from
+    values() projections elsewhere, and returned in the order of the ids.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return []
+    connection = connections[Recipe.objects.db]
+    if connection.vendor == 'postgresql':
+        documents = build_in_postgresql(recipe_ids, connection)
+    else:
+        documents = build_from_values(recipe_ids)
+    return [documents[recipe_id] for recipe_id in recipe_ids]
+
+
+def render_page(data, documents):
+    """Render paginated ``data`` with the documents as its results.
+
+    ``data`` is the body of a paginated response with empty results, or
+    None to render a plain list.
+    """
+    results = b'[' + b','.join(documents) + b']'
+    if data is None:
+        return results
+    data = {key: value for key, value in data.items() if key != 'results'}
+    if not data:
+        return b'{"results":' + results + b'}'
+    return (
+        FastJSONRenderer().render(data)[:-1] + b',"results":' + results
+        + b'}'
+    )
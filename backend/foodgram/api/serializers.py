@@ -1,19 +1,20 @@
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.db import transaction
 
 from rest_framework import serializers
 from rest_framework.relations import PrimaryKeyRelatedField
 
 from users.models import User
 
-from .fields import Base64ImageField
-from .models import (FavoriteRecipes, Follow, Ingredient, Recipe,
-                     ShopCartRecipes, Tag)
+from .fields import Base64ImageField, ImageSetField
+from .models import (FavoriteRecipes, Follow, Ingredient, Job, Recipe,
+                     RecipeIngredient, ShopCartRecipes, Tag)
 
 
 class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
-        fields = '__all__'
+        fields = ('id', 'name', 'color', 'slug')
         model = Tag
 
 
@@ -25,12 +26,16 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class IngredientForRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.IntegerField()
+    id = serializers.IntegerField(source='ingredient_id')
+    amount = serializers.IntegerField()
+    name = serializers.CharField(source='ingredient.name', read_only=True)
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit', read_only=True
+    )
 
     class Meta:
-        fields = '__all__'
-        model = Ingredient
-        read_only_fields = ('name', 'measurement_unit')
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+        model = RecipeIngredient
 
 
 class UserForReciperializer(serializers.ModelSerializer):
@@ -42,32 +47,66 @@ class UserForReciperializer(serializers.ModelSerializer):
 
 
 class ShopFavorSerializer(serializers.ModelSerializer):
+    image_set = ImageSetField()
+
     class Meta:
-        fields = ('id', 'name', 'image',  'cooking_time')
+        fields = ('id', 'name', 'image', 'image_set', 'cooking_time')
         model = Recipe
         read_only_fields = ('id', 'name', 'image', 'cooking_time')
 
 
+class JobSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        fields = (
+            'id', 'name', 'status', 'attempts', 'result', 'error',
+            'created_at', 'updated_at'
+        )
+        model = Job
+        read_only_fields = fields
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1, max_length=settings.BULK_RECIPES_MAX_SIZE
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     tags = PrimaryKeyRelatedField(
         many=True, queryset=Tag.objects.all()
     )
-    ingredients = IngredientForRecipeSerializer(many=True)
+    ingredients = IngredientForRecipeSerializer(
+        many=True, source='recipe_ingredients'
+    )
     author = UserForReciperializer(read_only=True)
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     image = Base64ImageField(max_length=None)
+    image_set = ImageSetField()
 
     class Meta:
         fields = (
             'id', 'tags', 'author', 'ingredients',
             'is_favorited', 'is_in_shopping_cart',
-            'name', 'image', 'text', 'cooking_time',
+            'name', 'image', 'image_set', 'text', 'cooking_time',
 
         )
         model = Recipe
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The stored image is kept when an update does not send a new one.
+        if self.instance is not None:
+            self.fields['image'].required = False
+
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context['request'].user
         if user.is_authenticated:
             return ShopCartRecipes.objects.filter(
@@ -76,6 +115,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         return False
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context['request'].user
         if user.is_authenticated:
             return FavoriteRecipes.objects.filter(
@@ -83,72 +124,160 @@ class RecipeSerializer(serializers.ModelSerializer):
             ).exists()
         return False
 
+    def get_author_is_subscribed(self, obj):
+        if hasattr(obj, 'author_is_subscribed'):
+            return obj.author_is_subscribed
+        user = self.context['request'].user
+        if user.is_authenticated:
+            return Follow.objects.filter(
+                user=user, author=obj.author_id
+            ).exists()
+        return False
+
     def to_representation(self, instance):
         representation = super(
             RecipeSerializer, self
         ).to_representation(instance)
-        serializer = TagSerializer(instance.tags, many=True)
+        serializer = TagSerializer(instance.tags.all(), many=True)
         representation['tags'] = serializer.data
-        if self.context['request'].user.is_authenticated:
-            is_subscribed = Follow.objects.filter(
-                user=self.context['request'].user, author=instance.author
-            ).exists()
-        else:
-            is_subscribed = False
-        representation['author']['is_subscribed'] = is_subscribed
+        representation['author']['is_subscribed'] = (
+            self.get_author_is_subscribed(instance)
+        )
         return representation
 
-    def create_or_update_ingredient(self, ingredients_data, tags, recipe):
-        for ingredient in ingredients_data:
-            new_ingredient = get_object_or_404(Ingredient, id=ingredient['id'])
-            new_ingredient.amount = ingredient['amount']
-            new_ingredient.save()
-            recipe.ingredients.add(new_ingredient)
+    def get_tags_mask(self, tags):
+        mask = 0
         for tag in tags:
-            recipe.tags.add(tag)
+            mask |= tag.mask
+        return mask
+
+    def create_ingredients_and_tags(self, ingredients_data, tags, recipe):
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, **ingredient)
+            for ingredient in ingredients_data
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag) for tag in tags
+        )
         return recipe
 
+    @transaction.atomic
     def create(self, validated_data):
-        ingredients_data = validated_data.pop('ingredients')
+        ingredients_data = validated_data.pop('recipe_ingredients')
         tags = validated_data.pop('tags')
-        recipe = Recipe.objects.create(**validated_data)
-        return self.create_or_update_ingredient(ingredients_data, tags, recipe)
-
-    def update(self, instance, validated_data):
-        instance.name = validated_data.get('name', instance.name)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = validated_data.get(
-            'cooking_time', instance.cooking_time
+        recipe = Recipe.objects.create(
+            **validated_data, tags_mask=self.get_tags_mask(tags)
         )
-        instance.image = validated_data.get('image', instance.image)
-        instance.save()
-        ingredients_data = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        instance.ingredients.clear()
-        instance.tags.clear()
-        return self.create_or_update_ingredient(
-            ingredients_data, tags, instance
+        return self.create_ingredients_and_tags(
+            ingredients_data, tags, recipe
         )
 
+    def update_tags(self, recipe, tags):
+        """Add and remove tag links; return whether anything changed."""
+        through = Recipe.tags.through
+        current = set(through.objects.filter(recipe=recipe).values_list(
+            'tag_id', flat=True
+        ))
+        wanted = {tag.pk for tag in tags}
+        if current - wanted:
+            through.objects.filter(
+                recipe=recipe, tag_id__in=current - wanted
+            ).delete()
+        if wanted - current:
+            through.objects.bulk_create(
+                through(recipe=recipe, tag_id=tag_id)
+                for tag_id in wanted - current
+            )
+        return current != wanted
+
+    def update_ingredients(self, recipe, ingredients_data):
+        """Apply the difference between the stored and the new amounts.
+
+        Returns whether any row was added, changed or deleted.
+        """
+        current = {
+            row.ingredient_id: row
+            for row in RecipeIngredient.objects.filter(recipe=recipe).only(
+                'pk', 'ingredient_id', 'amount'
+            )
+        }
+        wanted = {
+            ingredient['ingredient_id']: ingredient['amount']
+            for ingredient in ingredients_data
+        }
+        removed = [
+            row.pk for ingredient_id, row in current.items()
+            if ingredient_id not in wanted
+        ]
+        added = []
+        changed = []
+        for ingredient_id, amount in wanted.items():
+            row = current.get(ingredient_id)
+            if row is None:
+                added.append(RecipeIngredient(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                ))
+            elif row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if removed:
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+        return bool(removed or changed or added)
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        """Write only what differs from the stored recipe.
+
+        Relations missing from a partial update are left alone. Changed
+        relations still bump updated_at, which recipe ETags depend on.
+        """
+        ingredients_data = validated_data.pop('recipe_ingredients', None)
+        tags = validated_data.pop('tags', None)
+        update_fields = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        for field in update_fields:
+            setattr(instance, field, validated_data[field])
+        related_changed = False
+        if tags is not None:
+            related_changed = self.update_tags(instance, tags)
+            tags_mask = self.get_tags_mask(tags)
+            if tags_mask != instance.tags_mask:
+                instance.tags_mask = tags_mask
+                update_fields.append('tags_mask')
+        if ingredients_data is not None:
+            related_changed |= self.update_ingredients(
+                instance, ingredients_data
+            )
+        if update_fields or related_changed:
+            instance.save(update_fields=[*update_fields, 'updated_at'])
+        return instance
+
     def validate(self, data):
-        ingredients_ids = Ingredient.objects.all().values_list(
-            'id', flat=True
-        )
+        if 'recipe_ingredients' not in data:
+            return data
         ingredients_list = [
-            ingredient['id'] for ingredient in data['ingredients']
+            ingredient['ingredient_id']
+            for ingredient in data['recipe_ingredients']
         ]
         if len(ingredients_list) > len(set(ingredients_list)):
             raise serializers.ValidationError(
                     'This ingredient exists already'
             )
-        if not data['ingredients']:
+        if not ingredients_list:
             raise serializers.ValidationError(
                 'You must add at least one ingredient')
-        for ingredient in data['ingredients']:
-            if ingredient['id'] not in ingredients_ids:
-                raise serializers.ValidationError(
-                    'This ingredient does not exist'
-                )
+        existing = Ingredient.objects.filter(id__in=ingredients_list).count()
+        if existing < len(ingredients_list):
+            raise serializers.ValidationError(
+                'This ingredient does not exist'
+            )
+        for ingredient in data['recipe_ingredients']:
             if ingredient['amount'] <= 0:
                 raise serializers.ValidationError(
                     'Quantity of ingredients must not be less than 1'
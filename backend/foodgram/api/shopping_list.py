@@ -0,0 +1,158 @@
+import csv
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import F, Sum
+
+from .models import RecipeIngredient
+from .pdf import render_pdf
+
+FILENAME = 'shopping_list'
+CACHE_KEY = 'shopping_list:{user_id}:{version}:{export_format}'
+VERSION_KEY = 'shopping_list_version:{user_id}'
+
+
+class Echo:
+    """File-like object that hands written rows back to the csv writer."""
+
+    def write(self, value):
+        return value
+
+
+def get_shopping_list(user):
+    return RecipeIngredient.objects.filter(
+        recipe__shop_cart__user=user
+    ).values(
+        name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit'),
+    ).annotate(
+        total=Sum('amount')
+    ).order_by('name', 'measurement_unit')
+
+
+def to_txt(items):
+    for item in items:
+        yield (
+            f'{item["name"]}, {item["measurement_unit"]} - {item["total"]}\n'
+        )
+
+
+def to_csv(items):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for item in items:
+        yield writer.writerow(
+            (item['name'], item['measurement_unit'], item['total'])
+        )
+
+
+def to_json(items):
+    separator = ''
+    yield '['
+    for item in items:
+        yield separator + json.dumps({
+            'name': item['name'],
+            'measurement_unit': item['measurement_unit'],
+            'amount': item['total'],
+        }, ensure_ascii=False)
+        separator = ', '
+    yield ']'
+
+
+def to_pdf(items):
+    return render_pdf(
+        f'{item["name"]} ({item["measurement_unit"]}) - {item["total"]}'
+        for item in items
+    )
+
+
+EXPORT_FORMATS = {
+    'txt': (to_txt, 'text/plain; charset=utf-8'),
+    'csv': (to_csv, 'text/csv; charset=utf-8'),
+    'json': (to_json, 'application/json'),
+    'pdf': (to_pdf, 'application/pdf'),
+}
+
+
+def get_cache():
+    """Return the cache for lists, or None when it is not shared.
+
+    Carts change in whichever process handles the request, so with a
+    per-process cache the other workers would never see the new version
+    and would serve stale lists.
+    """
+    cache = caches['default']
+    if not settings.SHOPPING_LIST_CACHE_TIMEOUT or isinstance(
+        cache, LocMemCache
+    ):
+        return None
+    return cache
+
+
+def get_version(cache, user_id):
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def get_cache_key(user_id, export_format):
+    """Return the key of a cached list, or None when lists are not cached."""
+    cache = get_cache()
+    if cache is None:
+        return None
+    return CACHE_KEY.format(
+        user_id=user_id, version=get_version(cache, user_id),
+        export_format=export_format
+    )
+
+
+def get_cached_list(key):
+    return None if key is None else get_cache().get(key)
+
+
+def cache_chunks(chunks, key):
+    """Pass rendered chunks through and cache the whole document.
+
+    Documents larger than SHOPPING_LIST_CACHE_MAX_SIZE, or any document
+    when ``key`` is None, are streamed without being cached.
+    """
+    if key is None:
+        yield from chunks
+        return
+    collected = []
+    size = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        if collected is not None:
+            size += len(chunk)
+            if size > settings.SHOPPING_LIST_CACHE_MAX_SIZE:
+                collected = None
+            else:
+                collected.append(chunk)
+        yield chunk
+    if collected is not None:
+        get_cache().set(
+            key, b''.join(collected), settings.SHOPPING_LIST_CACHE_TIMEOUT
+        )
+
+
+def invalidate_shopping_lists(user_ids):
+    """Make every cached list of the given users stale.
+
+    Bumping the version instead of deleting the documents keeps a render
+    that started before the change from being cached as current.
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+    cache.set_many({
+        VERSION_KEY.format(user_id=user_id): uuid.uuid4().hex
+        for user_id in set(user_ids)
+    }, None)
@@ -0,0 +1,107 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version, ingredient_index
+from .counters import COUNTED_MODELS, update_counters
+from .jobs import enqueue
+from .models import FavoriteRecipes, Ingredient, Recipe, ShopCartRecipes, Tag
+from .shopping_list import invalidate_shopping_lists
+from .tasks import process_recipe_image
+from .toggles import relations_changed
+
+
+def catalog_changed():
+    ingredient_index.invalidate()
+    bump_catalog_version()
+
+
+def invalidate_on_commit(carts):
+    user_ids = list(carts.values_list('user_id', flat=True).distinct())
+    if user_ids:
+        transaction.on_commit(lambda: invalidate_shopping_lists(user_ids))
+
+
+@receiver([post_save, post_delete], sender=ShopCartRecipes)
+def cart_changed(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: invalidate_shopping_lists([instance.user_id])
+    )
+
+
+@receiver(relations_changed, sender=ShopCartRecipes)
+def carts_changed(sender, instances, **kwargs):
+    user_ids = [instance.user_id for instance in instances]
+    transaction.on_commit(lambda: invalidate_shopping_lists(user_ids))
+
+
+@receiver(relations_changed, sender=FavoriteRecipes)
+@receiver(relations_changed, sender=ShopCartRecipes)
+def counted_rows_changed(sender, instances, created, **kwargs):
+    update_counters(sender, instances, 1 if created else -1)
+
+
+def counted_row_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        update_counters(sender, [instance], 1)
+
+
+def counted_row_deleted(sender, instance, **kwargs):
+    update_counters(sender, [instance], -1)
+
+
+for model in COUNTED_MODELS:
+    post_save.connect(counted_row_saved, sender=model)
+    post_delete.connect(counted_row_deleted, sender=model)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_changed(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_on_commit(ShopCartRecipes.objects.filter(recipe=instance))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not instance.image:
+        return
+    if update_fields is None or 'image' in update_fields:
+        enqueue(process_recipe_image, name=instance.image.name)
+
+
+@receiver([post_save, pre_delete], sender=Ingredient)
+def ingredient_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        invalidate_on_commit(ShopCartRecipes.objects.filter(
+            recipe__recipe_ingredients__ingredient=instance
+        ))
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver([post_save, post_delete], sender=Tag)
+def catalog_item_changed(sender, **kwargs):
+    transaction.on_commit(catalog_changed)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        Recipe.objects.filter(pk=instance.pk).update_tags_mask()
+    elif pk_set:
+        Recipe.objects.filter(pk__in=pk_set).update_tags_mask()
+    else:
+        Recipe.objects.filter(
+            tags_mask=F('tags_mask').bitor(instance.mask)
+        ).update_tags_mask()
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    if instance.bit is not None:
+        Recipe.objects.filter(tags=instance).update(
+            tags_mask=F('tags_mask').bitand(~instance.mask)
+        )
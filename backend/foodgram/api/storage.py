@@ -0,0 +1,41 @@
+import hashlib
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentHashStorage(FileSystemStorage):
+    """File system storage that names files after their SHA-256 digest.
+
+    The directory and extension of the requested name are kept. Saving
+    content that is already stored writes nothing and returns the
+    existing name, so identical uploads share one file whose URL never
+    changes. Names in CONTENT_HASH_EXCLUDED_DIRS are saved as given.
+    """
+
+    def get_hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        directory, basename = posixpath.split(name)
+        extension = posixpath.splitext(basename)[1].lower()
+        return posixpath.join(directory, digest.hexdigest() + extension)
+
+    def is_excluded(self, name):
+        return any(
+            name.startswith(directory.rstrip('/') + '/')
+            for directory in settings.CONTENT_HASH_EXCLUDED_DIRS
+        )
+
+    def _save(self, name, content):
+        if self.is_excluded(name):
+            return super()._save(name, content)
+        name = self.get_hashed_name(name, content)
+        if self.exists(name):
+            # A reused file is as new as the upload, so gc_media's
+            # --min-age protects it until the referencing row commits.
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
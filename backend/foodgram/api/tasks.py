@@ -0,0 +1,47 @@
+import uuid
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .images import generate_renditions, shrink_stored_image
+from .jobs import task
+from .models import Recipe
+from .shopping_list import EXPORT_FORMATS, FILENAME, get_shopping_list
+
+
+@task
+def process_recipe_image(name):
+    """Shrink an oversized recipe image and write its renditions.
+
+    Recipes still pointing at ``name`` are switched to the shrunk copy
+    and get a new updated_at, which their ETags depend on; the original
+    is left to gc_media.
+    """
+    storage = Recipe._meta.get_field('image').storage
+    shrunk = shrink_stored_image(name, storage)
+    if shrunk is not None:
+        Recipe.objects.filter(image=name).update(
+            image=shrunk, updated_at=timezone.now()
+        )
+        name = shrunk
+    generate_renditions(name, storage)
+    return {'image': name}
+
+
+@task
+def export_shopping_list(user_id, export_format):
+    """Render a shopping list into a file and return its URL."""
+    render, content_type = EXPORT_FORMATS[export_format]
+    chunks = render(get_shopping_list(user_id).iterator())
+    content = b''.join(
+        chunk.encode() if isinstance(chunk, str) else chunk
+        for chunk in chunks
+    )
+    name = default_storage.save(
+        f'{settings.SHOPPING_LIST_EXPORTS_DIR}/{uuid.uuid4().hex}/'
+        f'{FILENAME}.{export_format}',
+        ContentFile(content)
+    )
+    return {'url': default_storage.url(name), 'content_type': content_type}
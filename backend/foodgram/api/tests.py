@@ -0,0 +1,253 @@
+import json
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import skipUnless
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from users.models import User
+
+from .fields import Base64ImageField
+from .images import generate_renditions
+from .models import Ingredient, Recipe, RecipeIngredient, Tag
+from .recipe_json import (build_documents, build_from_values,
+                          build_in_postgresql)
+from .renderers import FastJSONRenderer, orjson
+from .serializers import RecipeSerializer
+from .views import RecipeViewSet
+
+GIF = (
+    b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04'
+    b'\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D'
+    b'\x01\x00;'
+)
+# An 8x8 two-frame MPO with EXIF orientation, as phone cameras write.
+MPO_BASE64 = (
+    '/9j/4AAQSkZJRgABAQAAAQABAAD/4QAiRXhpZgAATU0AKgAAAAgAAQESAAMAAAABAAYA'
+    'AAAAAAD/4gBoTVBGAElJKgAIAAAAAwAAsAcABAAAADAxMDABsAQAAQAAAAIAAAACsAcA'
+    'IAAAADIAAAAAAAAAAAADAAYDAAAAAAAAAAAAAAAAAACcAgAAxgIAAAAAAAAgICAgICAg'
+    'ICAgICAgICAg/9sAQwAQCwwODAoQDg0OEhEQExgoGhgWFhgxIyUdKDozPTw5Mzg3QEhc'
+    'TkBEV0U3OFBtUVdfYmdoZz5NcXlwZHhcZWdj/9sAQwEREhIYFRgvGhovY0I4QmNjY2Nj'
+    'Y2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2Nj/8AAEQgA'
+    'CAAIAwEiAAIRAQMRAf/EAB8AAAEFAQEBAQEBAAAAAAAAAAABAgMEBQYHCAkKC//EALUQ'
+    'AAIBAwMCBAMFBQQEAAABfQECAwAEEQUSITFBBhNRYQcicRQygZGhCCNCscEVUtHwJDNi'
+    'coIJChYXGBkaJSYnKCkqNDU2Nzg5OkNERUZHSElKU1RVVldYWVpjZGVmZ2hpanN0dXZ3'
+    'eHl6g4SFhoeIiYqSk5SVlpeYmZqio6Slpqeoqaqys7S1tre4ubrCw8TFxsfIycrS09TV'
+    '1tfY2drh4uPk5ebn6Onq8fLz9PX29/j5+v/EAB8BAAMBAQEBAQEBAQEAAAAAAAABAgME'
+    'BQYHCAkKC//EALURAAIBAgQEAwQHBQQEAAECdwABAgMRBAUhMQYSQVEHYXETIjKBCBRC'
+    'kaGxwQkjM1LwFWJy0QoWJDThJfEXGBkaJicoKSo1Njc4OTpDREVGR0hJSlNUVVZXWFla'
+    'Y2RlZmdoaWpzdHV2d3h5eoKDhIWGh4iJipKTlJWWl5iZmqKjpKWmp6ipqrKztLW2t7i5'
+    'usLDxMXGx8jJytLT1NXW19jZ2uLj5OXm5+jp6vLz9PX29/j5+v/aAAwDAQACEQMRAD8A'
+    'xaKKK8s+8P/Z/9j/4AAQSkZJRgABAQAAAQABAAD/4QAiRXhpZgAATU0AKgAAAAgAAQES'
+    'AAMAAAABAAYAAAAAAAD/2wBDABALDA4MChAODQ4SERATGCgaGBYWGDEjJR0oOjM9PDkz'
+    'ODdASFxOQERXRTc4UG1RV19iZ2hnPk1xeXBkeFxlZ2P/2wBDARESEhgVGC8aGi9jQjhC'
+    'Y2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2P/'
+    'wAARCAAIAAgDASIAAhEBAxEB/8QAHwAAAQUBAQEBAQEAAAAAAAAAAAECAwQFBgcICQoL'
+    '/8QAtRAAAgEDAwIEAwUFBAQAAAF9AQIDAAQRBRIhMUEGE1FhByJxFDKBkaEII0KxwRVS'
+    '0fAkM2JyggkKFhcYGRolJicoKSo0NTY3ODk6Q0RFRkdISUpTVFVWV1hZWmNkZWZnaGlq'
+    'c3R1dnd4eXqDhIWGh4iJipKTlJWWl5iZmqKjpKWmp6ipqrKztLW2t7i5usLDxMXGx8jJ'
+    'ytLT1NXW19jZ2uHi4+Tl5ufo6erx8vP09fb3+Pn6/8QAHwEAAwEBAQEBAQEBAQAAAAAA'
+    'AAECAwQFBgcICQoL/8QAtREAAgECBAQDBAcFBAQAAQJ3AAECAxEEBSExBhJBUQdhcRMi'
+    'MoEIFEKRobHBCSMzUvAVYnLRChYkNOEl8RcYGRomJygpKjU2Nzg5OkNERUZHSElKU1RV'
+    'VldYWVpjZGVmZ2hpanN0dXZ3eHl6goOEhYaHiImKkpOUlZaXmJmaoqOkpaanqKmqsrO0'
+    'tba3uLm6wsPExcbHyMnK0tPU1dbX2Nna4uPk5ebn6Onq8vP09fb3+Pn6/9oADAMBAAIR'
+    'AxEAPwDjaKKK+8OU/9k='
+)
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def load(content):
+    # Pairs keep the key order, which has to match as well.
+    return json.loads(content, object_pairs_hook=list)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeJsonTests(TestCase):
+    """The database-built recipe JSON matches RecipeSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='cook', email='cook@example.com', password='secret',
+            first_name='Jean "Le Chef"', last_name='Dupré'
+        )
+        other = User.objects.create_user(
+            username='baker', email='baker@example.com', password='secret',
+            first_name='B', last_name='\\backslash'
+        )
+        tags = [
+            Tag.objects.create(name=name, slug=slug, color=color)
+            for name, slug, color in (
+                ('Ужин', 'dinner', '#000001'),
+                ('Breakfast', 'breakfast', '#000002'),
+            )
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (('salt', 'g'), ('milk', 'ml'), ('яйцо', 'шт'))
+        ]
+        cls.recipes = []
+        for number, (user, recipe_tags, amounts) in enumerate((
+            (author, tags, (5, 200, 2)),
+            (other, tags[:1], (1,)),
+            (author, [], (3, 1)),
+        )):
+            recipe = Recipe.objects.create(
+                author=user, name=f'Recipe «{number}»',
+                text='Line one\nline "two"\ttabbed',
+                cooking_time=number + 1,
+                image=SimpleUploadedFile('image.gif', GIF),
+            )
+            recipe.tags.set(recipe_tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=amount
+                )
+                for ingredient, amount in zip(ingredients, amounts)
+            )
+            cls.recipes.append(recipe)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def get_expected(self):
+        request = SimpleNamespace(
+            user=AnonymousUser(), query_params=QueryDict()
+        )
+        recipes = RecipeViewSet(request=request).get_queryset().order_by('pk')
+        data = RecipeSerializer(
+            recipes, many=True, context={'request': request}
+        ).data
+        return {
+            recipe['id']: load(FastJSONRenderer().render(recipe))
+            for recipe in data
+        }
+
+    def assert_documents_match(self, documents):
+        expected = self.get_expected()
+        self.assertEqual(set(documents), set(expected))
+        for recipe_id, document in documents.items():
+            with self.subTest(recipe=recipe_id):
+                self.assertEqual(load(document), expected[recipe_id])
+
+    def test_build_documents_keeps_id_order(self):
+        recipe_ids = [recipe.pk for recipe in reversed(self.recipes)]
+        documents = build_documents(recipe_ids)
+        self.assertEqual(
+            [json.loads(document)['id'] for document in documents],
+            recipe_ids
+        )
+        self.assertEqual(build_documents([]), [])
+
+    def test_values_documents_match_serializer(self):
+        self.assert_documents_match(
+            build_from_values([recipe.pk for recipe in self.recipes])
+        )
+
+    @skipUnless(
+        connection.vendor == 'postgresql', 'json_build_object needs PostgreSQL'
+    )
+    def test_postgresql_documents_match_serializer(self):
+        self.assert_documents_match(build_in_postgresql(
+            [recipe.pk for recipe in self.recipes], connection
+        ))
+
+    def test_anonymous_list_matches_serializer(self):
+        with self.settings(RECIPE_LIST_DB_JSON=False):
+            expected = self.client.get('/api/recipes/?limit=10').json()
+        with self.settings(RECIPE_LIST_DB_JSON=True):
+            response = self.client.get('/api/recipes/?limit=10')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(load(response.content), load(json.dumps(expected)))
+
+    def test_image_set_falls_back_to_original(self):
+        recipe = self.recipes[0]
+        url = f'/api/recipes/{recipe.pk}/'
+        image_set = self.client.get(url).json()['image_set']
+        self.assertEqual(
+            {url for urls in image_set.values() for url in urls.values()},
+            {recipe.image.url}
+        )
+        generate_renditions(recipe.image.name, recipe.image.storage)
+        image_set = self.client.get(url).json()['image_set']
+        self.assertNotIn(recipe.image.url, image_set['card'].values())
+        self.assertTrue(all(
+            recipe.image.storage.exists(
+                url[len(recipe.image.storage.base_url):]
+            )
+            for urls in image_set.values() for url in urls.values()
+        ))
+
+
+class FastJSONRendererTests(SimpleTestCase):
+
+    @skipUnless(orjson, 'orjson is not installed')
+    def test_int_keys_render_like_stdlib(self):
+        data = {'recipes': {0: ['A valid integer is required.']}}
+        self.assertEqual(
+            FastJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+
+class BulkToggleValidationTests(TestCase):
+
+    def test_invalid_ids_are_a_bad_request(self):
+        user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='secret'
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(
+            '/api/recipes/shopping_cart/', {'recipes': ['x', 1]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(),
+            {'recipes': {'0': ['A valid integer is required.']}}
+        )
+
+
+class Base64ImageFieldTests(SimpleTestCase):
+
+    def test_accepts_multi_picture_jpeg(self):
+        file = Base64ImageField().to_internal_value(
+            'data:image/jpeg;base64,' + MPO_BASE64
+        )
+        self.assertTrue(file.name.endswith('.jpg'))
+
+
+class RecipeOrderingTests(SimpleTestCase):
+
+    def get_ordering(self, ordering):
+        request = SimpleNamespace(
+            query_params=QueryDict(f'ordering={ordering}')
+        )
+        view = RecipeViewSet()
+        ordering_filter = view.filter_backends[-1]()
+        return ordering_filter.get_ordering(
+            request, Recipe.objects.all(), view
+        )
+
+    def test_ties_are_broken_by_id(self):
+        self.assertEqual(
+            self.get_ordering('-favorites_count'),
+            ['-favorites_count', '-id']
+        )
+        self.assertEqual(
+            self.get_ordering('in_carts_count,pub_date'),
+            ['in_carts_count', 'pub_date', '-id']
+        )
+
+    def test_default_ordering_is_kept(self):
+        self.assertEqual(self.get_ordering(''), ('-pub_date', '-id'))
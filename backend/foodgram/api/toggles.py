@@ -0,0 +1,196 @@
+from django.db import connections, router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+
+# Sent by add_relations and remove_relations with the affected
+# ``instances`` and ``created`` telling an insert from a delete.
+relations_changed = Signal()
+
+
+def get_condition(model, values, connection):
+    """Build a WHERE clause matching the given field values.
+
+    A list, tuple or set value is matched with IN.
+    """
+    ops = connection.ops
+    clauses, params = [], []
+    for name, value in values.items():
+        field = model._meta.get_field(name)
+        column = ops.quote_name(field.column)
+        if isinstance(value, (list, tuple, set)):
+            clauses.append('{} IN ({})'.format(
+                column, ', '.join(['%s'] * len(value))
+            ))
+            params.extend(
+                field.get_db_prep_value(getattr(item, 'pk', item), connection)
+                for item in value
+            )
+        else:
+            clauses.append(f'{column} = %s')
+            params.append(field.get_db_prep_value(
+                getattr(value, 'pk', value), connection
+            ))
+    return ' AND '.join(clauses), params
+
+
+def can_return_rows(connection):
+    return connection.vendor == 'postgresql'
+
+
+def get_returning_sql(model, returning, connection):
+    if returning is None:
+        return ''
+    column = model._meta.get_field(returning).column
+    return ' RETURNING ' + connection.ops.quote_name(column)
+
+
+def execute(connection, sql, params, returning):
+    """Run ``sql``; return the RETURNING values or the row count."""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        if returning is None:
+            return cursor.rowcount
+        return [row[0] for row in cursor.fetchall()]
+
+
+def delete_rows(model, values, using, returning=None):
+    """Delete the matching rows.
+
+    Returns the number of deleted rows, or the values of the ``returning``
+    field of each deleted row when it is given.
+    """
+    connection = connections[using]
+    condition, params = get_condition(model, values, connection)
+    sql = 'DELETE FROM {} WHERE {}{}'.format(
+        connection.ops.quote_name(model._meta.db_table), condition,
+        get_returning_sql(model, returning, connection)
+    )
+    return execute(connection, sql, params, returning)
+
+
+def insert_rows(model, rows, using, returning=None):
+    """Insert rows given as dicts with the same keys, skipping conflicts.
+
+    Returns the number of inserted rows, or the values of the
+    ``returning`` field of each inserted row when it is given.
+    """
+    connection = connections[using]
+    ops = connection.ops
+    fields = [model._meta.get_field(name) for name in rows[0]]
+    placeholders = '({})'.format(', '.join(['%s'] * len(fields)))
+    sql = '{} {} ({}) VALUES {} {}{}'.format(
+        ops.insert_statement(ignore_conflicts=True),
+        ops.quote_name(model._meta.db_table),
+        ', '.join(ops.quote_name(field.column) for field in fields),
+        ', '.join([placeholders] * len(rows)),
+        ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+        get_returning_sql(model, returning, connection),
+    )
+    params = [
+        field.get_db_prep_value(getattr(value, 'pk', value), connection)
+        for row in rows
+        for field, value in zip(fields, row.values())
+    ]
+    return execute(connection, sql, params, returning)
+
+
+def add_relation(model, **values):
+    """Insert a row unless an equal one exists, in a single statement.
+
+    Conflicts with the model's unique constraint are ignored by the
+    database, so concurrent requests cannot fail with IntegrityError.
+    Returns True when a row was inserted. post_save is sent for the new
+    row, whose pk is left unset, within the same transaction.
+    """
+    using = router.db_for_write(model)
+    with transaction.atomic(using=using):
+        created = insert_rows(model, [values], using) > 0
+        if created:
+            post_save.send(
+                sender=model, instance=model(**values), created=True,
+                update_fields=None, raw=False, using=using
+            )
+    return created
+
+
+def remove_relation(model, **values):
+    """Delete the matching row in a single statement.
+
+    Unlike QuerySet.delete() the rows are not fetched first, so the model
+    must not be the target of cascading relations. Returns True when a row
+    was deleted. post_delete is sent for it, with the pk left unset, within
+    the same transaction.
+    """
+    using = router.db_for_write(model)
+    with transaction.atomic(using=using):
+        deleted = delete_rows(model, values, using)
+        if deleted:
+            post_delete.send(
+                sender=model, instance=model(**values), using=using
+            )
+    return deleted > 0
+
+
+def get_existing(model, field, values, common, using):
+    return set(model.objects.using(using).select_for_update().filter(
+        **common, **{f'{field}__in': values}
+    ).values_list(field, flat=True))
+
+
+def add_relations(model, field, values, **common):
+    """Insert one row per value of ``field``, skipping existing ones.
+
+    A single INSERT is run and relations_changed is sent once, for the
+    rows actually inserted, instead of post_save for every row. PostgreSQL
+    reports them with RETURNING; elsewhere existing rows are looked up
+    first, which a concurrent insert can still race.
+    Returns the values of ``field`` that were inserted.
+    """
+    values = list(values)
+    if not values:
+        return []
+    using = router.db_for_write(model)
+    with transaction.atomic(using=using):
+        if can_return_rows(connections[using]):
+            rows = [{**common, field: value} for value in values]
+            added = insert_rows(model, rows, using, returning=field)
+        else:
+            existing = get_existing(model, field, values, common, using)
+            added = [value for value in values if value not in existing]
+            if added:
+                insert_rows(
+                    model, [{**common, field: value} for value in added],
+                    using
+                )
+        if added:
+            relations_changed.send(sender=model, instances=[
+                model(**common, **{field: value}) for value in added
+            ], created=True)
+    return added
+
+
+def remove_relations(model, field, values, **common):
+    """Delete the rows matching any value of ``field`` in one statement.
+
+    relations_changed is sent once, for the rows actually deleted, instead
+    of post_delete for every row. Returns the values of ``field`` that
+    were deleted.
+    """
+    values = list(values)
+    if not values:
+        return []
+    using = router.db_for_write(model)
+    condition = {**common, field: values}
+    with transaction.atomic(using=using):
+        if can_return_rows(connections[using]):
+            removed = delete_rows(model, condition, using, returning=field)
+        else:
+            existing = get_existing(model, field, values, common, using)
+            removed = [value for value in values if value in existing]
+            if removed:
+                delete_rows(model, {**common, field: removed}, using)
+        if removed:
+            relations_changed.send(sender=model, instances=[
+                model(**common, **{field: value}) for value in removed
+            ], created=False)
+    return removed
@@ -11,9 +11,13 @@ router = SimpleRouter()
 router.register('recipes', views.RecipeViewSet, basename='recipes')
 router.register('tags', views.TagViewSet, basename='tags')
 router.register('ingredients', views.IngredientViewSet, basename='ingredients')
+router.register('jobs', views.JobViewSet, basename='jobs')
 
 
 urlpatterns = [
-    path('recipes/download_shopping_cart/', views.download, name='download'),
+    path(
+        'recipes/download_shopping_cart/',
+        views.DownloadShoppingCartView.as_view(), name='download'
+    ),
     path('', include(router.urls)),
 ]
@@ -1,24 +1,82 @@
-from django.http import HttpResponse
+import hashlib
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
 
 from rest_framework import filters, status, viewsets
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action
+from rest_framework.negotiation import DefaultContentNegotiation
 from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from django_filters.rest_framework import DjangoFilterBackend
 
-from users.pagination import CustomPagination
+from users.pagination import RecipePagination
 
-from .filters import CustomIngredientFilter, CustomSearchFilter
-from .mixins import ListRetrieveViewSet
-from .models import FavoriteRecipes, Ingredient, Recipe, ShopCartRecipes, Tag
+from .catalog import (catalog_etag, catalog_last_modified, get_catalog_version,
+                      ingredient_index)
+from .filters import (CustomIngredientFilter, CustomSearchFilter,
+                      StableOrderingFilter)
+from .jobs import enqueue
+from .mixins import ListRetrieveViewSet, RetrieveViewSet
+from .models import (FavoriteRecipes, Ingredient, Job, Recipe, ShopCartRecipes,
+                     Tag)
 from .permissions import OwnerOrReadonly
-from .serializers import (IngredientSerializer, RecipeSerializer,
+from .recipe_json import build_documents, render_page
+from .serializers import (IngredientSerializer, JobSerializer,
+                          RecipeIdsSerializer, RecipeSerializer,
                           ShopFavorSerializer, TagSerializer)
+from .shopping_list import (EXPORT_FORMATS, FILENAME, cache_chunks,
+                            get_cache_key, get_cached_list, get_shopping_list)
+from .tasks import export_shopping_list
+from .toggles import (add_relation, add_relations, remove_relation,
+                      remove_relations)
+
+catalog_condition = condition(
+    etag_func=catalog_etag, last_modified_func=catalog_last_modified
+)
+
+
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+def recipe_etag(request, pk=None, **kwargs):
+    """Tag a recipe by its update time, the author's profile and flags.
+
+    Authors have no update time, so their fields shown in the body are
+    hashed into the tag. Bad primary keys are left to the view's 404.
+    """
+    if pk is None or not pk.isdigit():
+        return None
+    state = Recipe.objects.with_user_flags(request.user).filter(
+        pk=pk
+    ).values_list(
+        'updated_at', 'is_favorited', 'is_in_shopping_cart',
+        'author_is_subscribed',
+        *(f'author__{field}' for field in AUTHOR_FIELDS)
+    ).first()
+    if state is None:
+        return None
+    updated_at, *flags = state[:4]
+    author = hashlib.md5(
+        '\0'.join(state[4:]).encode()
+    ).hexdigest()[:12]
+    return '-'.join([
+        str(get_catalog_version(request)), pk, str(updated_at.timestamp()),
+        *(str(int(flag)) for flag in flags), author
+    ])
 
 
+@method_decorator(catalog_condition, name='list')
+@method_decorator(catalog_condition, name='retrieve')
 class IngredientViewSet(ListRetrieveViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -27,7 +85,27 @@ class IngredientViewSet(ListRetrieveViewSet):
     filterset_class = CustomIngredientFilter
     filterset_fields = ['name']
 
+    def get_search_limit(self):
+        limit = self.request.query_params.get('limit', '')
+        if limit.isdigit():
+            return min(int(limit), settings.INGREDIENT_SEARCH_LIMIT)
+        return settings.INGREDIENT_SEARCH_LIMIT
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        limit = self.get_search_limit()
+        if settings.INGREDIENT_INDEX_ENABLED:
+            ingredients = ingredient_index.search(name, limit)
+        else:
+            ingredients = self.filter_queryset(self.get_queryset())[:limit]
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data)
+
+
+@method_decorator(catalog_condition, name='list')
+@method_decorator(catalog_condition, name='retrieve')
 class TagViewSet(ListRetrieveViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -37,100 +115,232 @@ class TagViewSet(ListRetrieveViewSet):
 class RecipeViewSet(viewsets.ModelViewSet):
     serializer_class = RecipeSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, OwnerOrReadonly,)
-    pagination_class = CustomPagination
-    filter_backends = [DjangoFilterBackend]
+    pagination_class = RecipePagination
+    filter_backends = [DjangoFilterBackend, StableOrderingFilter]
     filterset_class = CustomSearchFilter
-    queryset = Recipe.objects.all()
+    ordering_fields = ('pub_date', 'favorites_count', 'in_carts_count')
+    ordering = ('-pub_date', '-id')
+
+    def get_queryset(self):
+        return Recipe.objects.with_related().with_user_flags(
+            self.request.user
+        )
+
+    def is_count_shared(self):
+        # Favourites and carts are filtered for the requesting user.
+        params = self.request.query_params
+        return 'is_favorited' not in params and (
+            'is_in_shopping_cart' not in params
+        )
+
+    def use_db_json(self, request):
+        return (
+            settings.RECIPE_LIST_DB_JSON
+            and not request.user.is_authenticated
+            and isinstance(request.accepted_renderer, JSONRenderer)
+            and not request.accepted_renderer.get_indent(
+                request.accepted_media_type, {}
+            )
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_db_json(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(
+            Recipe.objects.only('pk', *self.ordering_fields)
+        )
+        page = self.paginate_queryset(queryset)
+        documents = build_documents(
+            recipe.pk for recipe in (queryset if page is None else page)
+        )
+        data = None
+        if page is not None:
+            data = self.get_paginated_response([]).data
+        return HttpResponse(
+            render_page(data, documents),
+            content_type=request.accepted_renderer.media_type
+        )
+
+    @method_decorator(vary_on_headers('Authorization'))
+    @method_decorator(condition(etag_func=recipe_etag))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk
+        )
 
-    @action(detail=True,
-            methods=['get', 'delete'],
-            permission_classes=[IsAuthenticated])
-    def shopping_cart(self, request, *args, **kwargs):
+    def perform_update(self, serializer):
+        serializer.save()
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk
+        )
+
+    def toggle(self, model, already_error, missing_error):
         recipe_id = self.kwargs.get('pk')
-        recipe = get_object_or_404(self.get_queryset(), id=recipe_id)
-        serializer = ShopFavorSerializer(recipe)
-        is_in_shopping_cart = ShopCartRecipes.objects.filter(
-            user=self.request.user, recipe=recipe
-        ).exists()
-        if request.method == 'GET':
-            if not is_in_shopping_cart:
-                ShopCartRecipes.objects.create(
-                    user=request.user, recipe=recipe
-                )
+        if self.request.method == 'GET':
+            recipe = get_object_or_404(Recipe, id=recipe_id)
+            if add_relation(model, user=self.request.user, recipe=recipe):
                 return Response(
-                    serializer.data, status=status.HTTP_201_CREATED
+                    ShopFavorSerializer(recipe).data,
+                    status=status.HTTP_201_CREATED
                 )
-            return Response(
-                {"errors": "The recipe is already in the cart"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        elif request.method == 'DELETE':
-            if is_in_shopping_cart:
-                item = get_object_or_404(
-                    ShopCartRecipes, user=request.user, recipe=recipe
-                )
-                item.delete()
+            error = already_error
+        else:
+            if remove_relation(
+                model, user=self.request.user, recipe_id=recipe_id
+            ):
                 return Response(status=status.HTTP_204_NO_CONTENT)
-            return Response(
-                {"errors": "The recipe is not in the cart"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            get_object_or_404(Recipe, id=recipe_id)
+            error = missing_error
+        return Response(
+            {"errors": error},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    def bulk_toggle(self, model, already_error, missing_error):
+        serializer = RecipeIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        user = self.request.user
+        present = dict(Recipe.objects.filter(id__in=recipe_ids).annotate(
+            present=Exists(model.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            ))
+        ).values_list('id', 'present'))
+        adding = self.request.method == 'POST'
+        changed = [
+            recipe_id for recipe_id in recipe_ids
+            if recipe_id in present and present[recipe_id] != adding
+        ]
+        if adding:
+            done = add_relations(model, 'recipe_id', changed, user=user)
+        else:
+            done = remove_relations(model, 'recipe_id', changed, user=user)
+        done = set(done)
+        results = []
+        for recipe_id in recipe_ids:
+            if recipe_id not in present:
+                result = {'status': status.HTTP_404_NOT_FOUND,
+                          'errors': 'Not found.'}
+            elif recipe_id not in done:
+                # Already in the wanted state, possibly by a concurrent
+                # request.
+                result = {'status': status.HTTP_400_BAD_REQUEST,
+                          'errors': already_error if adding else missing_error}
+            elif adding:
+                result = {'status': status.HTTP_201_CREATED}
+            else:
+                result = {'status': status.HTTP_204_NO_CONTENT}
+            results.append({'id': recipe_id, **result})
+        return Response({'results': results})
+
+    @action(detail=True,
+            methods=['get', 'delete'],
+            permission_classes=[IsAuthenticated])
+    def shopping_cart(self, request, *args, **kwargs):
+        return self.toggle(
+            ShopCartRecipes,
+            'The recipe is already in the cart',
+            'The recipe is not in the cart'
+        )
 
     @action(detail=True,
             methods=['get', 'delete'],
             permission_classes=[IsAuthenticated])
     def favorite(self, request, *args, **kwargs):
-        recipe_id = self.kwargs.get('pk')
-        recipe = get_object_or_404(self.get_queryset(), id=recipe_id)
-        serializer = ShopFavorSerializer(recipe)
-        is_favorite = FavoriteRecipes.objects.filter(
-            user=self.request.user, recipe=recipe
-        ).exists()
-        if request.method == 'GET':
-            if not is_favorite:
-                FavoriteRecipes.objects.create(
-                    user=request.user, recipe=recipe
-                )
-                return Response(
-                    serializer.data, status=status.HTTP_201_CREATED
-                )
+        return self.toggle(
+            FavoriteRecipes,
+            'The recipe is already in the favourites',
+            'The recipe is not in the favourites'
+        )
+
+    @action(detail=False,
+            methods=['post', 'delete'],
+            permission_classes=[IsAuthenticated],
+            url_path='shopping_cart', url_name='shopping-cart-bulk')
+    def shopping_cart_bulk(self, request, *args, **kwargs):
+        return self.bulk_toggle(
+            ShopCartRecipes,
+            'The recipe is already in the cart',
+            'The recipe is not in the cart'
+        )
+
+    @action(detail=False,
+            methods=['post', 'delete'],
+            permission_classes=[IsAuthenticated],
+            url_path='favorite', url_name='favorite-bulk')
+    def favorite_bulk(self, request, *args, **kwargs):
+        return self.bulk_toggle(
+            FavoriteRecipes,
+            'The recipe is already in the favourites',
+            'The recipe is not in the favourites'
+        )
+
+
+class ShoppingListNegotiation(DefaultContentNegotiation):
+    """Leaves the ``format`` query parameter to the view.
+
+    Errors are rendered with the first configured renderer.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class DownloadShoppingCartView(APIView):
+    permission_classes = (IsAuthenticated,)
+    content_negotiation_class = ShoppingListNegotiation
+
+    def get_format_error(self, export_format):
+        if export_format not in EXPORT_FORMATS:
             return Response(
-                {"errors": "The recipe is already in the favourites"},
+                {"errors": "Supported formats: "
+                           f"{', '.join(EXPORT_FORMATS)}"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        elif request.method == 'DELETE':
-            if is_favorite:
-                item = get_object_or_404(
-                    FavoriteRecipes, user=request.user, recipe=recipe
-                )
-                item.delete()
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            return Response(
-                {"errors": "The recipe is not in the favourites"},
-                status=status.HTTP_400_BAD_REQUEST
+        return None
+
+    def post(self, request):
+        """Export the list in a background job and return the job."""
+        export_format = request.query_params.get('format', 'txt')
+        error = self.get_format_error(export_format)
+        if error is not None:
+            return error
+        job = enqueue(
+            export_shopping_list, user=request.user,
+            user_id=request.user.id, export_format=export_format
+        )
+        return Response(
+            JobSerializer(job).data, status=status.HTTP_202_ACCEPTED
+        )
+
+    def get(self, request):
+        export_format = request.query_params.get('format', 'txt')
+        error = self.get_format_error(export_format)
+        if error is not None:
+            return error
+        render, content_type = EXPORT_FORMATS[export_format]
+        key = get_cache_key(request.user.id, export_format)
+        content = get_cached_list(key)
+        if content is not None:
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            items = get_shopping_list(request.user).iterator()
+            response = StreamingHttpResponse(
+                cache_chunks(render(items), key), content_type=content_type
             )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{FILENAME}.{export_format}"'
+        )
+        return response
+
 
+class JobViewSet(RetrieveViewSet):
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated,)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def download(request):
-    qs = Recipe.objects.filter(shop_cart__user=request.user)
-    cart = {}
-    ingredients = Ingredient.objects.filter(
-        id__in=qs.values_list('ingredients', flat=True)
-    )
-    for ingredient in ingredients:
-        key = f'{ingredient.name}, {ingredient.measurement_unit}'
-        cart[key] = cart.get(
-            key, 0
-        ) + ingredient.amount
-    text_data = ""
-    for name, amount in cart.items():
-        string = f'{name} - {amount}'.format(name, amount)
-        text_data += string + '\n'
-    response = HttpResponse(text_data, content_type='text')
-    response['Content-Disposition'] = 'attachment;'
-    return response
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
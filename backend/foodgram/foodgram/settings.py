@@ -24,6 +24,14 @@ DATABASES = {
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -107,8 +115,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+    ] + (['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
@@ -117,3 +133,56 @@ REST_FRAMEWORK = {
 }
 
 AUTH_USER_MODEL = 'users.User'
+# Seconds to remember whose a token is. Only used with a cache shared by
+# all processes, such as Redis or Memcached; 0 turns it off.
+AUTH_TOKEN_CACHE_TIMEOUT = 60 * 5
+
+PAGINATION_MAX_PAGE_SIZE = 100
+# Seconds to reuse page counts of querysets shared by all users; 0 is off.
+PAGINATION_COUNT_CACHE_TIMEOUT = 0
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+SUBSCRIPTION_RECIPES_LIMIT = 3
+SUBSCRIPTION_RECIPES_MAX_LIMIT = 50
+
+BULK_RECIPES_MAX_SIZE = 100
+
+# Shopping lists are cached only in a cache shared by all processes.
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60 * 24
+SHOPPING_LIST_CACHE_MAX_SIZE = 1024 * 1024
+SHOPPING_LIST_EXPORTS_DIR = 'exports'
+
+INGREDIENT_INDEX_ENABLED = True
+INGREDIENT_SEARCH_LIMIT = 50
+
+# Enable only after `manage.py test api` has passed on PostgreSQL, which
+# runs the json_build_object branch that SQLite skips.
+RECIPE_LIST_DB_JSON = False
+
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_DIMENSION = 2048
+IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+IMAGE_SPOOL_MAX_MEMORY = 1024 * 1024
+IMAGE_JPEG_QUALITY = 85
+# Rendition name -> longest side in pixels, from smallest to largest.
+IMAGE_RENDITIONS = {'thumbnail': 160, 'card': 480, 'full': 1280}
+IMAGE_RENDITIONS_DIR = 'recipes/renditions'
+
+# Uploads are named after their content, renditions after their original.
+DEFAULT_FILE_STORAGE = 'api.storage.ContentHashStorage'
+CONTENT_HASH_EXCLUDED_DIRS = (IMAGE_RENDITIONS_DIR, SHOPPING_LIST_EXPORTS_DIR)
+# Recipes carry their image base64 encoded in the JSON body.
+DATA_UPLOAD_MAX_MEMORY_SIZE = IMAGE_UPLOAD_MAX_SIZE * 4 // 3 + 1024 * 1024
+
+# Background jobs, see api/jobs.py. Eager jobs run in the request process
+# after the transaction commits, for development without run_workers.
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False') == 'True'
+JOBS_POLL_INTERVAL = 1
+# Seconds a worker may hold a job before another one takes it over.
+JOBS_TIMEOUT = 10 * 60
+# Seconds before the first retry, doubled on every further attempt.
+JOBS_RETRY_DELAY = 30
+
+PDF_FONT_PATH = os.getenv(
+    'PDF_FONT_PATH', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
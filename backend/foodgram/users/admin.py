@@ -1,16 +1,19 @@
 from django.contrib import admin
 
 from .models import User
+from .pagination import EstimatedCountPaginator
 
 
 class UserAdmin(admin.ModelAdmin):
     list_display = (
         'email', 'username',
         'first_name', 'last_name',
-        'password'
+        'password', 'recipes_count', 'followers_count'
     )
     search_fields = ('username', 'email', 'first_name', 'last_name')
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(User, UserAdmin)
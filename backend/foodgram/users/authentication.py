@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import router
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from .models import User
+
+CACHE_KEY = 'auth_token:{key}'
+
+
+def get_cache():
+    """Return the cache for tokens, or None when it is not shared.
+
+    A per-process cache could not be cleared on logout in every worker,
+    so revoked tokens would keep working there until they expire.
+    """
+    cache = caches['default']
+    if not settings.AUTH_TOKEN_CACHE_TIMEOUT or isinstance(
+        cache, LocMemCache
+    ):
+        return None
+    return cache
+
+
+def get_cache_key(key):
+    return CACHE_KEY.format(key=key)
+
+
+def forget_tokens(keys):
+    cache = get_cache()
+    if cache is not None:
+        cache.delete_many([get_cache_key(key) for key in keys])
+
+
+def dump_user(user):
+    fields = User._meta.concrete_fields
+    return (
+        [field.attname for field in fields],
+        [getattr(user, field.attname) for field in fields],
+    )
+
+
+def load_user(state):
+    """Rebuild a user from dump_user(), or None after a schema change."""
+    names, values = state
+    if names != [field.attname for field in User._meta.concrete_fields]:
+        return None
+    return User.from_db(router.db_for_read(User), names, values)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that remembers the user of a token.
+
+    The user's columns are cached for AUTH_TOKEN_CACHE_TIMEOUT seconds in
+    a shared cache, so authenticated requests run no query for it. The
+    entry is dropped when the token is deleted or the user is saved, see
+    users.signals; counters, which change without save(), are never
+    written back, see CounterFieldsMixin.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_cache()
+        if cache is None:
+            return super().authenticate_credentials(key)
+        cache_key = get_cache_key(key)
+        state = cache.get(cache_key)
+        user = None if state is None else load_user(state)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(
+                cache_key, dump_user(user), settings.AUTH_TOKEN_CACHE_TIMEOUT
+            )
+            return user, token
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                'User inactive or deleted.'
+            )
+        return user, self.get_model()(key=key, user=user)
@@ -2,14 +2,43 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
-class User(AbstractUser):
+class CounterFieldsMixin:
+    """Keep the counter columns out of updates made with save().
+
+    Counters are changed with F() expressions only, see api/counters.py,
+    so the values loaded with an instance may be stale. Saves that name
+    the counters in ``update_fields`` still write them.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CounterFieldsMixin, AbstractUser):
     email = models.EmailField(max_length=254, unique=True)
     username = models.CharField(max_length=150, unique=True)
     first_name = models.CharField(max_length=150)
     last_name = models.CharField(max_length=150)
     password = models.CharField(max_length=150)
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Recipes count'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Followers count'
+    )
     USERNAME_FIELD = 'username'
 
+    counter_fields = ('recipes_count', 'followers_count')
+
     class Meta:
         verbose_name = 'User'
         verbose_name_plural = 'Users'
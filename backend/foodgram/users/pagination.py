@@ -1,6 +1,111 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator that reuses the total count of a query for a short time.
+
+    The count is cached per SQL statement for
+    PAGINATION_COUNT_CACHE_TIMEOUT seconds, so page numbers may lag behind
+    the data by that much, and the last page loses rows added meanwhile.
+    Only use it for querysets that are the same for every user.
+    """
+
+    @cached_property
+    def count(self):
+        timeout = settings.PAGINATION_COUNT_CACHE_TIMEOUT
+        if not timeout or not isinstance(self.object_list, QuerySet):
+            return super().count
+        sql, params = self.object_list.query.sql_with_params()
+        key = 'pagination_count:' + hashlib.md5(
+            f'{sql}{params}'.encode()
+        ).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, timeout)
+        return count
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts the planner's row estimate for whole tables.
+
+    An unfiltered queryset on PostgreSQL is counted from
+    pg_class.reltuples, which VACUUM and ANALYZE keep roughly current, as
+    long as the estimate reaches ESTIMATED_COUNT_THRESHOLD rows. Filtered
+    querysets, small tables and other databases are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            connection = connections[queryset.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT reltuples FROM pg_class '
+                        'WHERE oid = %s::regclass',
+                        [queryset.model._meta.db_table]
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] >= settings.ESTIMATED_COUNT_THRESHOLD:
+                    return int(row[0])
+        return super().count
+
+
+class CustomCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    page_size = 6
+    max_page_size = settings.PAGINATION_MAX_PAGE_SIZE
+    ordering = ('-id',)
+
+
+class RecipeCursorPagination(CustomCursorPagination):
+    ordering = ('-pub_date', '-id')
 
 
 class CustomPagination(PageNumberPagination):
+    """Page number pagination with an opt-in cursor mode.
+
+    Passing ``cursor`` (empty for the first page) switches to keyset
+    pagination, which runs neither COUNT(*) nor OFFSET.
+
+    Counts are cached only when PAGINATION_COUNT_CACHE_TIMEOUT is set and
+    the view's ``is_count_shared()`` says the queryset does not depend on
+    the user.
+    """
     page_size_query_param = 'limit'
     page_size = 6
+    max_page_size = settings.PAGINATION_MAX_PAGE_SIZE
+    cursor_pagination_class = CustomCursorPagination
+    cursor_pagination = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor_pagination = self.cursor_pagination_class()
+        if cursor_pagination.cursor_query_param in request.query_params:
+            self.cursor_pagination = cursor_pagination
+            return cursor_pagination.paginate_queryset(
+                queryset, request, view
+            )
+        is_count_shared = getattr(view, 'is_count_shared', None)
+        if is_count_shared is not None and is_count_shared():
+            self.django_paginator_class = CachedCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_pagination is not None:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RecipePagination(CustomPagination):
+    cursor_pagination_class = RecipeCursorPagination
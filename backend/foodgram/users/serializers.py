@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
 from django.core import exceptions as django_exceptions
 
@@ -13,6 +14,13 @@ from api.serializers import ShopFavorSerializer
 from .models import User
 
 
+def get_recipes_limit(query_params):
+    limit = query_params.get('recipes_limit', '')
+    if limit.isdigit():
+        return min(int(limit), settings.SUBSCRIPTION_RECIPES_MAX_LIMIT)
+    return settings.SUBSCRIPTION_RECIPES_LIMIT
+
+
 class UserCreateSerializer(UserSerializer):
 
     class Meta:
@@ -59,17 +67,17 @@ class UserReadSerializer(UserSerializer):
         ]
 
     def get_is_subscribed(self, obj):
-        if self.context['request'].user.is_authenticated:
-            return Follow.objects.filter(
-                user=self.context['request'].user, author=obj
-            ).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        user = self.context['request'].user
+        if user.is_authenticated and user != obj:
+            return Follow.objects.filter(user=user, author=obj).exists()
         return False
 
 
 class SubscribeSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -82,20 +90,12 @@ class SubscribeSerializer(UserSerializer):
     def get_is_subscribed(self, obj):
         return UserReadSerializer.get_is_subscribed(self, obj)
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.all().count()
-
     def get_recipes(self, obj):
-        count = 5
-        query = self.context['request'].query_params
-        if (
-            'recipes_limit' in query.keys()
-            and (query['recipes_limit']).isdigit()
-        ):
-            count = int(query['recipes_limit'])
-            qs = obj.recipes.all()[:count]
+        if hasattr(obj, 'latest_recipes'):
+            qs = obj.latest_recipes
         else:
-            qs = obj.recipes.all()
+            count = get_recipes_limit(self.context['request'].query_params)
+            qs = obj.recipes.all()[:count]
         serializer = ShopFavorSerializer(qs, many=True)
         return serializer.data
 
@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_tokens
+from .models import User
+
+
+def forget_tokens_on_commit(keys):
+    # Forget the tokens again after the commit in case a concurrent
+    # request cached the old state in the meantime.
+    forget_tokens(keys)
+    transaction.on_commit(lambda: forget_tokens(keys))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    forget_tokens_on_commit([instance.key])
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, **kwargs):
+    # Covers set_password and deactivation, which save the user.
+    if created:
+        return
+    keys = list(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
+    if keys:
+        forget_tokens_on_commit(keys)
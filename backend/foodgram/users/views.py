@@ -1,3 +1,5 @@
+from django.db.models import (BooleanField, Exists, OuterRef, Prefetch, Value,
+                              prefetch_related_objects)
 from django.shortcuts import get_object_or_404
 
 from rest_framework import status, viewsets
@@ -6,20 +8,47 @@ from rest_framework.decorators import action, api_view
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from api.models import Follow
+from api.models import Follow, Recipe
+from api.toggles import add_relation, remove_relation
 
 from .models import User
 from .pagination import CustomPagination
 from .permissions import IsOwnerOrAuthenticated
 from .serializers import (PasswordSerializer, SubscribeSerializer,
                           UserCreateSerializer, UserGetTokenSerializer,
-                          UserReadSerializer)
+                          UserReadSerializer, get_recipes_limit)
 
 
 class UserCustomViewSet(viewsets.ModelViewSet):
     pagination_class = CustomPagination
     permission_classes = (AllowAny, IsOwnerOrAuthenticated)
-    queryset = User.objects.all()
+
+    def get_queryset(self):
+        user = self.request.user
+        if not user.is_authenticated:
+            return User.objects.annotate(is_subscribed=Value(
+                False, output_field=BooleanField()
+            ))
+        return User.objects.annotate(is_subscribed=Exists(
+            Follow.objects.filter(user=user, author=OuterRef('pk'))
+        ))
+
+    def is_count_shared(self):
+        return self.action == 'list'
+
+    def get_authors_queryset(self):
+        return self.get_queryset().order_by('-id')
+
+    def prefetch_latest_recipes(self, authors):
+        limit = get_recipes_limit(self.request.query_params)
+        prefetch_related_objects(authors, Prefetch(
+            'recipes',
+            queryset=Recipe.objects.top_per_author(
+                [author.pk for author in authors], limit
+            ),
+            to_attr='latest_recipes'
+        ))
+        return authors
 
     def get_serializer_class(self):
         if self.action in ['create']:
@@ -40,21 +69,26 @@ class UserCustomViewSet(viewsets.ModelViewSet):
         serializer = PasswordSerializer(user, data=request.data)
         serializer.is_valid(raise_exception=True)
         user.set_password(serializer.validated_data['new_password'])
-        user.save()
+        user.save(update_fields=['password'])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated],
             url_path='')
     def subscriptions(self, request):
-        followings = User.objects.filter(following__user=self.request.user)
+        followings = self.get_authors_queryset().filter(
+            following__user=self.request.user
+        )
         page = self.paginate_queryset(followings)
         if page is not None:
-            serializer = SubscribeSerializer(page, context={
-                'request': self.request}, many=True)
+            serializer = SubscribeSerializer(
+                self.prefetch_latest_recipes(page),
+                context={'request': self.request}, many=True
+            )
             return self.get_paginated_response(serializer.data)
         serializer = SubscribeSerializer(
-            followings, many=True, context={
+            self.prefetch_latest_recipes(list(followings)), many=True,
+            context={
                 'request': self.request,
             }
         )
@@ -67,39 +101,31 @@ class UserCustomViewSet(viewsets.ModelViewSet):
     )
     def subscribe(self, request, *args, **kwargs):
         author_id = self.kwargs.get('pk')
-        author = get_object_or_404(self.get_queryset(), id=author_id)
-        is_subscribed = Follow.objects.filter(
-            user=self.request.user,
-            author=author
-        ).exists()
         if request.method == 'GET':
+            author = get_object_or_404(
+                self.get_authors_queryset(), id=author_id
+            )
             if request.user == author:
                 error = 'You can not subscribe to yourself'
+            elif add_relation(Follow, user=request.user, author=author):
+                author.is_subscribed = True
+                serializer = SubscribeSerializer(
+                    self.prefetch_latest_recipes([author])[0], context={
+                        'request': self.request,
+                    }
+                )
+                return Response(
+                    serializer.data,
+                    status=status.HTTP_201_CREATED
+                )
             else:
-                if not is_subscribed:
-                    Follow.objects.create(
-                        user=request.user, author=author
-                    )
-                    author = get_object_or_404(
-                        self.get_queryset(), id=author_id
-                    )
-                    serializer = SubscribeSerializer(
-                        author, context={
-                            'request': self.request,
-                        }
-                    )
-                    return Response(
-                        serializer.data,
-                        status=status.HTTP_201_CREATED
-                    )
                 error = 'You have already been subscribed to this author'
         elif request.method == 'DELETE':
-            if is_subscribed:
-                item = get_object_or_404(
-                    Follow, user=request.user, author=author
-                )
-                item.delete()
+            if remove_relation(
+                Follow, user=request.user, author_id=author_id
+            ):
                 return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(User, id=author_id)
             error = 'You have been not subscribed to this author'
         return Response(
             {"errors": error},